@@ -31,12 +31,12 @@ if __name__ == "__main__":
     # ------------------------------------------------------------
     # edge_types can be ['Send', 'Receive', 'Send+Receive']
     edge_type = 'Send+Receive'
-    # a good starting plot_node is likely
-    # nlr.receiver_fails_name[0] or nlr.sender_fails_name[1]
-    plot_node = nlr.receiver_fails_name[0]
+    # a good starting plot_node (node id) is likely
+    # nlr.receiver_fails_id[0] or nlr.sender_fails_id[1]
+    plot_node = nlr.receiver_fails_id[0]
 
     print(f'Your selected python environment is: {python_environment}')
-    print(f'{edge_type=} and {plot_node=}')
+    print(f'{edge_type=} and plot_node={nlr.node_name(plot_node)}')
 
     # Create cumulative error figure
     if True:
@@ -44,7 +44,7 @@ if __name__ == "__main__":
 
     # plot_network1 uses slow built-in routines and you should use plot_network3 instead
     if False:
-        nlp.plot_network1(nlr.send_graph, nlr.plot_data)
+        nlp.plot_network1(nlr.graph.to_networkx('Send'), nlr.plot_data)
 
     # plot_network3 is the primary plot of interest to show failure relations.
     fig01 = nlp.plot_network3(nlr, plot_node, edge_type)
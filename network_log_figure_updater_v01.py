@@ -0,0 +1,154 @@
+"""
+NetworkLogFigureUpdater renders the figure updates requested by widget callbacks in a
+background thread, so dragging a slider does not queue a figure update for every value.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import time
+import threading
+import traceback
+
+
+class NetworkLogFigureUpdater:
+    """Coalesce figure update requests and render them in a background thread.
+
+    Notes
+    -------
+    1. request(...) only records the latest requested (plot_node, edge_type) and returns, so widget
+        callbacks never wait for a figure update.
+    2. A daemon thread renders the requests with render(plot_node, edge_type, force).  Requests made
+        while an update is in flight replace each other and only the latest one is rendered next.
+    3. With a debounce interval, rendering waits until no request was made for debounce seconds
+        (trailing edge), e.g. until a slider stopped moving.
+    4. While no request is pending after an update, the thread runs the tasks returned by
+        prefetch(plot_node, edge_type) one at a time, e.g. to calculate the plot data of the nodes
+        likely to be selected next.  A new request is rendered as soon as the running task is done.
+    5. self.requests and self.renders count the requests made and the updates rendered.
+        If cached is given, self.hits and self.misses count the rendered nodes that were (not) cached
+        before rendering, see hit_rate.
+    6. close() stops the thread, so it no longer keeps the figure and the data of render alive.
+    """
+
+    def __init__(self, render, debounce=None, prefetch=None, cached=None):
+        """Initialize NetworkLogFigureUpdater.
+
+        Parameters
+        ----------
+        render : callable
+            render(plot_node, edge_type, force) updates the figure, e.g. NetworkLogPlotter.update_figure.
+        debounce : None|float
+            Seconds without requests to wait before rendering, None to render as soon as possible.
+        prefetch : None|callable
+            prefetch(plot_node, edge_type) returns an iterable of callables (tasks) to run while idle.
+        cached : None|callable
+            cached(plot_node) returns True if the data to render plot_node is already cached.
+        """
+        self.render = render
+        self.debounce = debounce
+        self.prefetch = prefetch
+        self.cached = cached
+
+        self.pending = None
+        self.force = False
+        self.busy = False
+        self.closed = False
+        self.last_request = 0.0
+        self.requests = 0
+        self.renders = 0
+        self.prefetched = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request(self, plot_node, edge_type, force=False):
+        """Request a figure update, replacing any request that was not rendered yet.
+
+        force is kept until the next update is rendered, so a forced request is never lost to coalescing.
+        Requests made after close are ignored.
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.pending = (plot_node, edge_type)
+            self.force = self.force or force
+            self.last_request = time.monotonic()
+            self.requests += 1
+            self.condition.notify_all()
+
+    def run(self):
+        """Render the latest request until close is called (target of self.thread)."""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.closed)
+                if self.debounce:
+                    while not self.closed:
+                        remaining = self.last_request + self.debounce - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                if self.closed:
+                    return
+                (plot_node, edge_type), force = self.pending, self.force
+                self.pending, self.force, self.busy = None, False, True
+
+            try:
+                if self.cached is not None:
+                    if self.cached(plot_node):
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                self.render(plot_node, edge_type, force)
+            except Exception:
+                # Keep the thread alive for the next request
+                print(f'Figure update of node {plot_node} {edge_type} failed')
+                traceback.print_exc()
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.renders += 1
+                    self.condition.notify_all()
+
+            if self.prefetch is not None:
+                self.run_prefetch(plot_node, edge_type)
+
+    def run_prefetch(self, plot_node, edge_type):
+        """Run the prefetch tasks of the rendered state until a new request is made."""
+        try:
+            for task in self.prefetch(plot_node, edge_type):
+                with self.condition:
+                    if self.pending is not None or self.closed:
+                        return
+                task()
+                self.prefetched += 1
+        except Exception:
+            print(f'Prefetch for node {plot_node} {edge_type} failed')
+            traceback.print_exc()
+
+    def hit_rate(self):
+        """Fraction of the rendered nodes that were cached before rendering (see cached)."""
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def wait(self, timeout=None):
+        """Block until every request has been rendered (or the updater is closed),
+        returns False if timeout seconds passed first."""
+        with self.condition:
+            return self.condition.wait_for(lambda: (self.pending is None or self.closed) and not self.busy, timeout)
+
+    def close(self, timeout=None):
+        """Stop the thread after the update it is rendering, pending requests are dropped.
+
+        Returns False if the thread is still running after timeout seconds.
+        """
+        with self.condition:
+            self.closed = True
+            self.pending = None
+            self.condition.notify_all()
+        if threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+        return not self.thread.is_alive()
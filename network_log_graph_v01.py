@@ -0,0 +1,141 @@
+"""
+NetworkLogGraph stores the send/receive failure network of a server error log
+as sparse adjacency matrices over dense node ids.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    import networkx as nx
+except ImportError:     # networkx is optional, only to_networkx needs it
+    nx = None
+
+
+class NetworkLogGraph:
+    """Sparse adjacency matrices of a network failure log.
+
+    Notes
+    -------
+    1. Nodes are the dense node ids of NetworkLogReader (positions in its node table).
+    2. self.send is a scipy CSR matrix with send[a, b] the summed fails of every line
+        in which node a sent to node b.  The other edge types are derived from it:
+            'Send' - send, row a holds the nodes a sends fails to.
+            'Receive' - send.T, row a holds the nodes a receives fails from.
+            'Send+Receive' - send + send.T, row a holds the nodes a has any fails with.
+    3. Per-node totals are the row (send) and column (receive) sums of send.
+    """
+
+    # Edge types of the adjacency matrices (see matrix)
+    edge_types = ('Send', 'Receive', 'Send+Receive')
+
+    def __init__(self, sender_id, receiver_id, fails, num_nodes):
+        """Initialize NetworkLogGraph.
+
+        Parameters
+        ----------
+        sender_id, receiver_id : numpy.ndarray of int
+            Node id of the sender/receiver of each line (or edge).
+        fails : numpy.ndarray
+            Number of fails of each line (or edge).  Lines with the same sender and receiver are summed.
+        num_nodes : int
+            Number of nodes in the node table.
+        """
+        self.num_nodes = num_nodes
+        self.send = self.edge_matrix(sender_id, receiver_id, fails, num_nodes)
+        self.update_matrices()
+
+    @staticmethod
+    def edge_matrix(sender_id, receiver_id, fails, num_nodes):
+        """Create a num_nodes x num_nodes CSR matrix with the summed fails of each sender/receiver pair."""
+        matrix = sp.coo_matrix((np.asarray(fails, dtype=np.int64),
+                                (np.asarray(sender_id, dtype=np.intp), np.asarray(receiver_id, dtype=np.intp))),
+                               shape=(num_nodes, num_nodes)).tocsr()
+        # Converting to CSR sums duplicate pairs, make sure the column indices of each row are sorted too
+        matrix.sum_duplicates()
+        return matrix
+
+    def update_matrices(self):
+        """Derive the receive and send+receive matrices and per-node totals from self.send."""
+        self.receive = self.send.T.tocsr()
+        self.receive.sum_duplicates()
+        self.total = (self.send + self.receive).tocsr()
+        self.total.sum_duplicates()
+        self.send_fails = np.asarray(self.send.sum(axis=1), dtype=np.int64).ravel()
+        self.receive_fails = np.asarray(self.send.sum(axis=0), dtype=np.int64).ravel()
+
+    def add_edges(self, sender_id, receiver_id, fails):
+        """Add the fails of new lines (or edges) to the graph.
+
+        The new lines are summed into a sparse matrix and added to self.send,
+        so the cost grows with the number of edges rather than the number of lines.
+        """
+        self.send = (self.send + self.edge_matrix(sender_id, receiver_id, fails, self.num_nodes)).tocsr()
+        self.send.sum_duplicates()
+        self.update_matrices()
+
+    def matrix(self, edge_type):
+        """Adjacency matrix of edge_type ('Send', 'Receive' or 'Send+Receive')."""
+        if edge_type == 'Send':
+            return self.send
+        elif edge_type == 'Receive':
+            return self.receive
+        elif edge_type == 'Send+Receive':
+            return self.total
+        else:
+            raise Exception(f'Unknown edge_type: {edge_type}')
+
+    def edges(self, node_a, edge_type):
+        """Find the edges of a single node.
+
+        Parameters
+        ----------
+        node_a : int
+            The node id of interest.
+        edge_type : ['Send', 'Receive', 'Send+Receive']
+            Type of connection to analyse.
+
+        Returns
+        -------
+        nodes : numpy.ndarray of int32
+            Node ids connected to node_a, sorted by node id.
+        weights : numpy.ndarray of int64
+            Summed fails between node_a and each node.
+        """
+        matrix = self.matrix(edge_type)
+        start, end = matrix.indptr[node_a], matrix.indptr[node_a + 1]
+        return matrix.indices[start:end], matrix.data[start:end]
+
+    def weight(self, node_a, node_b, edge_type):
+        """Summed fails of the edge node_a -> node_b of edge_type, 0 if there is none."""
+        nodes, weights = self.edges(node_a, edge_type)
+        i = np.searchsorted(nodes, node_b)
+        if i < len(nodes) and nodes[i] == node_b:
+            return int(weights[i])
+        return 0
+
+    def edge_weights(self, node_a, nodes, edge_type):
+        """Summed fails of the edges node_a -> nodes of edge_type (0 where there is none), as a numpy array."""
+        edge_nodes, weights = self.edges(node_a, edge_type)
+        nodes = np.asarray(nodes)
+        if len(edge_nodes) == 0:
+            return np.zeros(len(nodes), dtype=np.int64)
+        i = np.minimum(np.searchsorted(edge_nodes, nodes), len(edge_nodes) - 1)
+        return np.where(edge_nodes[i] == nodes, weights[i], 0)
+
+    def to_networkx(self, edge_type='Send'):
+        """Export an adjacency matrix as a networkx.DiGraph with 'weight' edge attributes.
+
+        Every node id is added, including nodes without edges of edge_type.
+        """
+        if nx is None:
+            raise Exception('networkx is required to export the network graph')
+        coo = self.matrix(edge_type).tocoo()
+        d_graph = nx.DiGraph()
+        d_graph.add_nodes_from(range(self.num_nodes))
+        d_graph.add_weighted_edges_from(zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist()))
+        return d_graph
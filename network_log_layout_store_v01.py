@@ -0,0 +1,112 @@
+"""
+NetworkLogLayoutStore keeps node coordinates keyed by ip address in a file, so the layouts
+of different log files (e.g. one per day) place the same server in the same location.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+
+class NetworkLogLayoutStore:
+    """Node coordinates keyed by ip address, saved as a .npz file.
+
+    Notes
+    -------
+    1. self.addresses is a sorted uint32 array of ip addresses (see NetworkLogParser.ip_to_int) and
+        self.xy the (N, 2) float32 coordinates of each address.
+    2. Addresses are looked up with a binary search, so a lookup of a whole node table is O(N log N)
+        and never loops over the nodes in python.
+    3. See NetworkLogReader.layout_network(layout_store=...) to reuse the stored coordinates
+        and only place the nodes that were not seen before.
+    """
+
+    def __init__(self, file_name):
+        """Initialize NetworkLogLayoutStore, loading file_name if it exists.
+
+        Parameters
+        ----------
+        file_name : str
+            .npz file holding the stored coordinates.
+        """
+        self.file_name = file_name
+        self.addresses = np.zeros(0, dtype=np.uint32)
+        self.xy = np.zeros((0, 2), dtype=np.float32)
+        if os.path.exists(file_name):
+            self.load()
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def load(self):
+        """Read the stored coordinates from self.file_name."""
+        with np.load(self.file_name) as data:
+            self.addresses = data['addresses'].astype(np.uint32, copy=False)
+            self.xy = data['xy'].astype(np.float32, copy=False)
+
+    def save(self):
+        """Write the coordinates to self.file_name.
+
+        The file is written to a temporary file and renamed into place,
+        so other processes never see a partially written store.
+        """
+        store_dir = os.path.dirname(os.path.abspath(self.file_name))
+        os.makedirs(store_dir, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=store_dir, prefix='.tmp.', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, addresses=self.addresses, xy=self.xy)
+            os.replace(tmp_name, self.file_name)
+        except BaseException:
+            os.remove(tmp_name)
+            raise
+
+    def lookup(self, addresses):
+        """Find the stored coordinates of ip addresses.
+
+        Parameters
+        ----------
+        addresses : numpy.ndarray of uint32
+            ip addresses to look up, e.g. NodeTable.addresses.
+
+        Returns
+        -------
+        xy : numpy.ndarray of float32
+            (N, 2) coordinates of each address, nan if it is not stored.
+        known : numpy.ndarray of bool
+            True for the addresses that are stored.
+        """
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        xy = np.full((len(addresses), 2), np.nan, dtype=np.float32)
+        if len(self.addresses) == 0:
+            return xy, np.zeros(len(addresses), dtype=bool)
+        i = np.minimum(np.searchsorted(self.addresses, addresses), len(self.addresses) - 1)
+        known = self.addresses[i] == addresses
+        xy[known] = self.xy[i[known]]
+        return xy, known
+
+    def update(self, addresses, xy):
+        """Store the coordinates of ip addresses, replacing the coordinates of addresses that are already stored.
+
+        Parameters
+        ----------
+        addresses : numpy.ndarray of uint32
+            Unique ip addresses.
+        xy : numpy.ndarray of float
+            (N, 2) coordinates of each address.
+        """
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        xy = np.asarray(xy, dtype=np.float32).reshape(-1, 2)
+
+        # Keep the stored addresses that are not updated and merge in the new ones in sorted order
+        keep = ~np.isin(self.addresses, addresses)
+        all_addresses = np.concatenate([self.addresses[keep], addresses])
+        all_xy = np.concatenate([self.xy[keep], xy])
+        order = np.argsort(all_addresses, kind='stable')
+        self.addresses = all_addresses[order]
+        self.xy = all_xy[order]
@@ -0,0 +1,444 @@
+"""
+NetworkLogLayouts computes node layouts of very large networks from the node table columns,
+as numpy arrays aligned with the node ids.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import os
+import time
+import warnings
+import concurrent.futures
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as sp_linalg
+import scipy.fft as sp_fft
+
+
+class NetworkLogLayouts:
+    """Node layout routines for networks too large for the networkx layouts.
+
+    Every layout returns an (N, 2) numpy array with the [x, y] coordinates of node ids 0 .. N-1,
+    approximately ranging from 0, 0 to 1, 1 (see NodeTable.set_positions)."""
+
+    # Number of nodes placed by each thread of subnet_layout
+    chunk_nodes = 1 << 20
+
+    # Default iteration budgets of spectral_layout and force_layout
+    spectral_iterations = 200
+    force_iterations = 50
+
+    # Graphs with at most this many nodes are solved with a dense eigensolver by spectral_layout
+    # (scipy lobpcg switches to a dense solver without constraint support for small graphs anyway)
+    dense_spectral_nodes = 200
+
+    @staticmethod
+    def subnet_layout(addresses, noise=0.1, seed=0, margin=0.1, workers=None):
+        """Place nodes hierarchically by ip address: /16 blocks, then /24 tiles, then hosts within a tile.
+
+        Parameters
+        ----------
+        addresses : numpy.ndarray of uint32
+            Sorted ip address of each node (NodeTable.addresses).
+        noise : float
+            Fraction of a host cell added as random noise so hosts don't line up perfectly.
+        seed : None|int
+            Seed of the numpy random generator of the noise, None for a different layout each time.
+        margin : float
+            Fraction of each block and tile left empty around its content, so the subnets are visibly separated.
+        workers : None|int
+            Number of threads placing the hosts of large networks, None for os.cpu_count().
+
+        Returns
+        -------
+        xy : numpy.ndarray of float
+            (N, 2) array with the [x, y] coordinates of each node.
+
+        Notes
+        -------
+        1) The /16 blocks are placed on a square-ish grid over the unit square in address order.
+        2) The /24 tiles of a block are placed on a square-ish grid inside the block.
+        3) A tile is a 16 x 16 grid of host cells, the cell of a host is given by the last octet of its address,
+            so a host is always in the same place of its tile (a rack/subnet map).
+        4) Every step is vectorized over the blocks, tiles or nodes, so the layout runs in linear time.
+            The hosts of networks with more than chunk_nodes nodes are placed in parallel, a chunk of whole
+            tiles per thread.
+        """
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        num_nodes = len(addresses)
+        xy = np.zeros((num_nodes, 2))
+        if num_nodes == 0:
+            return xy
+
+        # Tile (/24) of each node and block (/16) of each tile, addresses are sorted so the prefixes are too
+        tile_prefix, node_tile = np.unique(addresses >> np.uint32(8), return_inverse=True)
+        block_prefix, tile_block = np.unique(tile_prefix >> np.uint32(8), return_inverse=True)
+
+        # Blocks on a square-ish grid over the unit square
+        block_size = 1 / NetworkLogLayouts.grid_size(len(block_prefix))
+        block_origin = NetworkLogLayouts.grid_cells(np.arange(len(block_prefix)), len(block_prefix)) * block_size
+
+        # Tiles on a square-ish grid inside their block
+        tiles_per_block = np.bincount(tile_block)
+        first_tile = np.concatenate([[0], np.cumsum(tiles_per_block)[:-1]])
+        tile_rank = np.arange(len(tile_prefix)) - first_tile[tile_block]
+        tiles_per_axis = NetworkLogLayouts.grid_size(tiles_per_block[tile_block])
+        tile_size = block_size * (1 - margin) / tiles_per_axis
+        tile_origin = block_origin[tile_block] + block_size * margin / 2 + \
+            NetworkLogLayouts.grid_cells(tile_rank, tiles_per_block[tile_block]) * tile_size[:, None]
+
+        # Hosts on a 16 x 16 grid inside their tile, by the last octet of their address
+        cell_size = tile_size * (1 - margin) / 16
+        host_origin = tile_origin + (tile_size * margin / 2)[:, None]
+        rng = np.random.default_rng(seed)
+        jitter = rng.uniform(-noise, noise, size=(num_nodes, 2))
+
+        def place_hosts(start, end):
+            tiles = node_tile[start:end]
+            octet = (addresses[start:end] & np.uint32(0xFF)).astype(np.intp)
+            cells = np.column_stack([octet % 16, octet // 16]) + 0.5 + jitter[start:end]
+            xy[start:end] = host_origin[tiles] + cells * cell_size[tiles, None]
+
+        # Chunks of whole tiles, so each thread lays out complete tiles
+        tile_starts = np.flatnonzero(np.concatenate([[True], node_tile[1:] != node_tile[:-1]]))
+        chunk_starts = np.arange(0, num_nodes, NetworkLogLayouts.chunk_nodes)
+        bounds = tile_starts[np.searchsorted(tile_starts, chunk_starts, side='right') - 1]
+        bounds = np.unique(np.concatenate([bounds, [num_nodes]]))
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(bounds) - 1))
+
+        if workers == 1:
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                place_hosts(start, end)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(place_hosts, bounds[:-1], bounds[1:]))
+        return xy
+
+    @staticmethod
+    def spectral_layout(adjacency, iterations=None, time_limit=None, tol=1e-5, regularization=1.0, seed=0):
+        """Spectral layout of a sparse graph with a sparse eigensolver (scipy lobpcg).
+
+        Parameters
+        ----------
+        adjacency : scipy.sparse matrix
+            Symmetric N x N matrix of edge weights, e.g. NetworkLogGraph.matrix('Send+Receive').
+        iterations : None|int
+            Maximum number of eigensolver iterations, None for spectral_iterations.
+        time_limit : None|float
+            Seconds after which the best coordinates found so far are returned, None for no limit.
+        tol : float
+            Residual norm at which the eigenvectors are converged.
+        regularization : float
+            Weight of a uniform edge between every pair of nodes, as a fraction of the mean node degree.
+        seed : None|int
+            Seed of the random starting vectors.
+
+        Returns
+        -------
+        xy : numpy.ndarray of float
+            (N, 2) array with the [x, y] coordinates of each node scaled to the unit square.
+
+        Notes
+        -------
+        1) Edge weights are log(1 + fails), so a few huge failure counts don't dominate the layout.
+        2) The coordinates are the 2nd and 3rd eigenvectors of the normalized adjacency matrix
+            D^-1/2 (A + tau/N) D^-1/2, scaled by D^-1/2.  The tau/N term (regularized spectral clustering)
+            keeps disconnected components and isolated nodes from collapsing onto single points.
+            It is applied matrix-free, so memory and time per iteration are O(N + edges).
+        3) The eigensolver runs in rounds of 10 iterations until the eigenvectors are converged or the
+            iteration budget or time limit is spent.
+        4) Graphs of at most dense_spectral_nodes nodes are solved exactly with numpy.linalg.eigh.
+        """
+        start_time = time.monotonic()
+        if iterations is None:
+            iterations = NetworkLogLayouts.spectral_iterations
+        adjacency = sp.csr_matrix(adjacency, dtype=float)
+        adjacency.data = np.log1p(adjacency.data)
+        num_nodes = adjacency.shape[0]
+        if num_nodes < 3:
+            return NetworkLogLayouts.scale_to_unit(np.random.default_rng(seed).uniform(size=(num_nodes, 2)))
+
+        degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        tau = regularization * max(degree.mean(), 1e-12)
+        scale = 1 / np.sqrt(degree + tau)
+
+        def matmat(x):
+            x = x.reshape(num_nodes, -1) * scale[:, None]
+            return (adjacency @ x + tau / num_nodes * x.sum(axis=0)) * scale[:, None]
+
+        if num_nodes <= NetworkLogLayouts.dense_spectral_nodes:
+            # eigh sorts the eigenvalues ascending, the largest eigenvector is the trivial one
+            values, vectors = np.linalg.eigh(matmat(np.eye(num_nodes)))
+            return NetworkLogLayouts.scale_to_unit(vectors[:, [-2, -3]] * scale[:, None])
+
+        operator = sp_linalg.LinearOperator((num_nodes, num_nodes), matvec=matmat, matmat=matmat, dtype=float)
+
+        # The largest eigenvector is known (sqrt of the degrees), constrain the search to be orthogonal to it
+        trivial = (1 / scale / np.linalg.norm(1 / scale))[:, None]
+        x = np.random.default_rng(seed).standard_normal((num_nodes, 2))
+        done = 0
+        while done < iterations:
+            rounds = min(10, iterations - done)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                values, x = sp_linalg.lobpcg(operator, x, Y=trivial, tol=tol, maxiter=rounds, largest=True)
+            done += rounds
+            residual = np.linalg.norm(matmat(x) - x * values, axis=0).max()
+            if residual < tol or (time_limit is not None and time.monotonic() - start_time > time_limit):
+                break
+        return NetworkLogLayouts.scale_to_unit(x * scale[:, None])
+
+    @staticmethod
+    def force_layout(adjacency, init=None, iterations=None, time_limit=None, grid=None, seed=0, fixed=None,
+                     temperature=0.1, k=None):
+        """Force-directed layout of a sparse graph with a particle-mesh approximation of the repulsion.
+
+        Parameters
+        ----------
+        adjacency : scipy.sparse matrix
+            Symmetric N x N matrix of edge weights, e.g. NetworkLogGraph.matrix('Send+Receive').
+        init : None|numpy.ndarray
+            (N, 2) starting coordinates, e.g. from spectral_layout.  None for random coordinates.
+        iterations : None|int
+            Maximum number of iterations, None for force_iterations.
+        time_limit : None|float
+            Seconds after which the coordinates are returned, None for no limit.
+        grid : None|int
+            Number of cells per axis of the repulsion mesh, None for about one node per cell (at most 512).
+        seed : None|int
+            Seed of the random starting coordinates.
+        fixed : None|numpy.ndarray of bool
+            Nodes that keep their init coordinates, e.g. to only refine newly placed nodes.
+            The coordinates are then not scaled to the unit square.
+        temperature : float
+            Largest distance a node moves in the first iteration.
+        k : None|float
+            Ideal distance between nodes, None for 1/sqrt(N).  Set it to refine part of a larger layout.
+
+        Returns
+        -------
+        xy : numpy.ndarray of float
+            (N, 2) array with the [x, y] coordinates of each node scaled to the unit square.
+
+        Notes
+        -------
+        1) Fruchterman-Reingold forces: every edge attracts its nodes with d^2/k * w and every pair of nodes
+            repels with k^2/d, where k = 1/sqrt(N) and w = log(1 + fails) normalized to a maximum of 1.
+            Each node moves at most the temperature, which cools linearly to 0 over the iterations
+            (or the time limit, if it runs out first).
+        2) Attraction is computed over the sparse edges, O(edges) per iteration.
+        3) Instead of the O(N^2) pairs (or a Barnes-Hut tree) the repulsion is computed on a mesh:
+            node masses are spread onto grid x grid cells, convolved (FFT) with the k^2/d force kernel,
+            and the field is interpolated back to the nodes, O(N + grid^2 log(grid)) per iteration.
+        """
+        start_time = time.monotonic()
+        if iterations is None:
+            iterations = NetworkLogLayouts.force_iterations
+        # Each edge once (upper triangle), its force is applied to both of its nodes
+        coo = sp.triu(sp.coo_matrix(adjacency, dtype=float), k=1).tocoo()
+        num_nodes = coo.shape[0]
+        rng = np.random.default_rng(seed)
+        if fixed is not None:
+            xy = np.array(init, dtype=float)
+        else:
+            xy = rng.uniform(size=(num_nodes, 2)) if init is None else NetworkLogLayouts.scale_to_unit(init)
+        if num_nodes < 2:
+            return xy
+
+        weights = np.log1p(coo.data)
+        weights /= max(weights.max(initial=0), 1e-12)
+        if grid is None:
+            grid = int(min(max(np.sqrt(num_nodes), 8), 512))
+        if k is None:
+            k = 1 / np.sqrt(num_nodes)
+        kernel = NetworkLogLayouts.mesh_kernel(grid)
+        start_temperature = temperature
+        ends = np.concatenate([coo.row, coo.col])
+
+        for iteration in range(iterations):
+            # Fraction of the iteration budget or time limit spent, whichever is larger
+            spent = iteration / iterations
+            if time_limit is not None:
+                spent = max(spent, (time.monotonic() - start_time) / time_limit)
+                if spent >= 1:
+                    break
+
+            # Attraction along the edges
+            delta = xy[coo.col] - xy[coo.row]
+            distance = np.sqrt((delta ** 2).sum(axis=1))
+            force = delta * (distance * weights / k)[:, None]
+            force = np.concatenate([force, -force])
+            displacement = np.column_stack([np.bincount(ends, force[:, 0], num_nodes),
+                                            np.bincount(ends, force[:, 1], num_nodes)])
+
+            # Repulsion between all nodes on the mesh
+            displacement += NetworkLogLayouts.mesh_repulsion(xy, grid, k, kernel)
+            if fixed is not None:
+                displacement[fixed] = 0
+
+            # Move each node at most the temperature
+            temperature = start_temperature * (1 - spent)
+            length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-12)
+            xy += displacement * (np.minimum(length, temperature) / length)[:, None]
+        return xy if fixed is not None else NetworkLogLayouts.scale_to_unit(xy)
+
+    @staticmethod
+    def place_new_nodes(adjacency, xy, known, near='neighbours', iterations=20, seed=0):
+        """Place the nodes of an existing layout that have no coordinates yet, without moving the others.
+
+        Parameters
+        ----------
+        adjacency : scipy.sparse matrix
+            Symmetric N x N matrix of edge weights, e.g. NetworkLogGraph.matrix('Send+Receive').
+        xy : numpy.ndarray of float
+            (N, 2) coordinates, only used where known is True.
+        known : numpy.ndarray of bool
+            Nodes that already have coordinates, at least one.
+        near : str
+            'neighbours' to place new nodes around the nodes they have fails with (for graph layouts), or
+            'address' to place them next to the closest ip address (for layouts ordered by ip address).
+        iterations : int
+            Number of force_layout iterations refining the new nodes.
+        seed : None|int
+            Seed of the random noise added to the new coordinates.
+
+        Returns
+        -------
+        xy : numpy.ndarray of float
+            (N, 2) coordinates, equal to the given coordinates of the known nodes.
+
+        Notes
+        -------
+        1) With near='neighbours' a new node is placed at the weighted mean of its placed neighbours,
+            repeated so chains of new nodes are placed outward from the known nodes.
+        2) Other new nodes are placed next to the known node with the closest node id,
+            which is the closest known ip address.
+        3) The new nodes get a little noise so they don't coincide.  With near='neighbours' they are then
+            refined by force_layout on the subgraph of the new nodes placed by their neighbours and those
+            neighbours, with the known nodes fixed, so the cost depends on the new nodes and not on the size
+            of the graph.
+        """
+        known = np.asarray(known, dtype=bool)
+        if not known.any():
+            raise Exception('place_new_nodes needs at least one node with known coordinates')
+        xy = np.array(xy, dtype=float)
+        if known.all():
+            return xy
+        adjacency = sp.csr_matrix(adjacency, dtype=float)
+        weights = adjacency.copy()
+        weights.data = np.log1p(weights.data)
+        placed = known.copy()
+
+        # Weighted mean of the placed neighbours, outward from the known nodes
+        while near == 'neighbours' and not placed.all():
+            todo = np.flatnonzero(~placed)
+            neighbours = weights[todo][:, placed]
+            weight = np.asarray(neighbours.sum(axis=1)).ravel()
+            reached = weight > 0
+            if not reached.any():
+                break
+            xy[todo[reached]] = (neighbours[reached] @ xy[placed]) / weight[reached, None]
+            placed[todo[reached]] = True
+
+        # Next to the known node with the closest id (ip address)
+        known_ids = np.flatnonzero(known)
+        todo = np.flatnonzero(~placed)
+        i = np.searchsorted(known_ids, todo)
+        before, after = known_ids[np.maximum(i - 1, 0)], known_ids[np.minimum(i, len(known_ids) - 1)]
+        xy[todo] = xy[np.where(np.abs(todo - before) <= np.abs(after - todo), before, after)]
+
+        # Separate the new nodes from the nodes they were placed on, then refine them
+        spacing = 1 / np.sqrt(len(xy))
+        new = ~known
+        xy[new] += np.random.default_rng(seed).normal(scale=spacing / 2, size=(int(new.sum()), 2))
+        if near == 'address':
+            return xy
+        elif near == 'neighbours':
+            reached = new & placed
+            nodes = np.union1d(np.flatnonzero(reached), weights[reached].indices)
+            xy[nodes] = NetworkLogLayouts.force_layout(adjacency[nodes][:, nodes], xy[nodes], iterations,
+                                                       fixed=known[nodes], temperature=spacing, k=spacing)
+            return xy
+        else:
+            raise Exception(f'Unknown near: {near}')
+
+    @staticmethod
+    def mesh_kernel(grid):
+        """FFT of the x and y force of a unit mass at every grid offset, for a grid cell size of 1 (see mesh_repulsion).
+
+        Returns
+        -------
+        shape : (int, int)
+            Padded size of the FFT convolution.
+        kernel_x, kernel_y : numpy.ndarray of complex
+            Real FFT of the x and y force kernels.
+        """
+        offset = np.arange(-grid, grid + 1, dtype=float)
+        ox, oy = np.meshgrid(offset, offset, indexing='ij')
+        r2 = ox ** 2 + oy ** 2
+        r2[grid, grid] = np.inf
+        size = sp_fft.next_fast_len(3 * grid + 1, real=True)
+        shape = (size, size)
+        return shape, sp_fft.rfft2(ox / r2, shape), sp_fft.rfft2(oy / r2, shape)
+
+    @staticmethod
+    def mesh_repulsion(xy, grid, k, kernel):
+        """Approximate repulsive force k^2/d of all nodes on each node with a cloud-in-cell particle mesh.
+
+        kernel is the mesh_kernel(grid) of the force between the grid points."""
+        low = xy.min(axis=0)
+        cell = max((xy.max(axis=0) - low).max(), 1e-12) / grid
+
+        # Spread each node over the 4 grid points around it (grid + 1 points per axis)
+        u = (xy - low) / cell
+        corner = np.minimum(np.floor(u).astype(np.intp), grid - 1)
+        fraction = u - corner
+        points = grid + 1
+        corners = [(0, 0), (1, 0), (0, 1), (1, 1)]
+        indices, shares = [], []
+        for dx, dy in corners:
+            indices.append((corner[:, 0] + dx) * points + corner[:, 1] + dy)
+            shares.append(np.abs(1 - dx - fraction[:, 0]) * np.abs(1 - dy - fraction[:, 1]))
+        mass = np.zeros(points * points)
+        for index, share in zip(indices, shares):
+            mass += np.bincount(index, share, points * points)
+        mass = mass.reshape(points, points)
+
+        # Masses convolved with the force of a unit mass at every offset, scaled from unit cells to cell
+        shape, kernel_x, kernel_y = kernel
+        mass_fft = sp_fft.rfft2(mass, shape)
+        field = [(sp_fft.irfft2(mass_fft * kernel_fft, shape)[grid:grid + points, grid:grid + points] *
+                  (k ** 2 / cell)).ravel() for kernel_fft in (kernel_x, kernel_y)]
+
+        # Interpolate the field back to the nodes
+        force = np.zeros_like(xy)
+        for index, share in zip(indices, shares):
+            force[:, 0] += field[0][index] * share
+            force[:, 1] += field[1][index] * share
+        return force
+
+    @staticmethod
+    def scale_to_unit(xy):
+        """Scale coordinates to fit the unit square, keeping their aspect ratio."""
+        xy = np.asarray(xy, dtype=float)
+        if len(xy) == 0:
+            return xy.reshape(0, 2)
+        low = xy.min(axis=0)
+        span = (xy.max(axis=0) - low).max()
+        return (xy - low) / span if span > 0 else xy - low + 0.5
+
+    @staticmethod
+    def grid_size(count):
+        """Number of cells per axis of a square-ish grid with room for count cells (works on arrays)."""
+        return np.maximum(np.ceil(np.sqrt(count)), 1)
+
+    @staticmethod
+    def grid_cells(index, count):
+        """[column, row] of cell index in a square-ish grid of count cells, filled row by row (works on arrays)."""
+        per_axis = NetworkLogLayouts.grid_size(count)
+        return np.column_stack([index % per_axis, index // per_axis])
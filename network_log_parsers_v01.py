@@ -0,0 +1,770 @@
+"""
+NetworkLogParser parses server error log files in 'fails sender receiver' format
+into numpy columns with a choice of parse engines.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import io
+import os
+import re
+import bz2
+import gzip
+import lzma
+import mmap
+import time
+import zlib
+import collections
+import concurrent.futures
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pc
+except ImportError:     # pyarrow is optional, the pyarrow engine is unavailable without it
+    pa = None
+
+try:
+    import zstandard
+except ImportError:     # zstandard is optional, zstd compressed logs can't be read without it
+    zstandard = None
+
+
+class NetworkLogParser:
+    """Parse network failure logs into fails, sender and receiver numpy arrays.
+
+    Each log line holds an integer and two dotted quad ip addresses, optionally preceded by a
+    single header line (e.g. 'fails sender receiver').
+
+    This can be converted into a module rather than a class if all methods stay static."""
+
+    # Engine chosen by benchmark_engines when engine='auto', shared by all readers in the session
+    auto_engine = None
+
+    # Bytes of the log parsed at a time by the numpy engine to bound its temporary arrays
+    numpy_block_bytes = 1 << 26
+
+    # Uncompressed bytes of a gzip member decompressed at a time, bounds the memory of large members
+    gzip_piece_bytes = 1 << 24
+
+    # Magic bytes at the start of compressed log files (see detect_compression)
+    compression_magic = {'gzip': b'\x1f\x8b', 'bz2': b'BZh', 'xz': b'\xfd7zXZ\x00', 'zstd': b'\x28\xb5\x2f\xfd'}
+
+    @staticmethod
+    def available_engines():
+        """List the parse engines that can be used with the installed packages.
+
+        Returns
+        -------
+        engines : list of str
+            'numpy' - bytes-level vectorized tokenizer (see parse_numpy)
+            'pandas' - pandas C engine with explicit dtypes (see parse_pandas)
+            'pyarrow' - pyarrow csv reader and compute kernels (see parse_pyarrow), if pyarrow is installed
+        """
+        engines = ['numpy', 'pandas']
+        if pa is not None:
+            engines.append('pyarrow')
+        return engines
+
+    @staticmethod
+    def select_engine(engine, file_name=None):
+        """Resolve an engine name, benchmarking the available engines for engine='auto'.
+
+        Parameters
+        ----------
+        engine : str
+            'auto' or one of available_engines().
+        file_name : None|str
+            Log file used as the benchmark sample for engine='auto'.
+
+        Returns
+        -------
+        engine : str
+            Name of an available engine.
+        """
+        if engine == 'auto':
+            if NetworkLogParser.auto_engine is None:
+                timings = NetworkLogParser.benchmark_engines(file_name)
+                NetworkLogParser.auto_engine = min(timings, key=timings.get)
+            return NetworkLogParser.auto_engine
+        if engine not in NetworkLogParser.available_engines():
+            raise Exception(f'Unknown or unavailable parse engine: {engine}')
+        return engine
+
+    @staticmethod
+    def benchmark_engines(file_name=None, sample_bytes=1 << 22, repeat=3):
+        """Time each available engine on a sample of a log file.
+
+        Parameters
+        ----------
+        file_name : None|str
+            Log file to sample.  None uses a generated sample in the log format.
+        sample_bytes : int
+            Number of bytes from the start of the log file to parse.
+        repeat : int
+            Number of timed parses per engine, the fastest is kept.
+
+        Returns
+        -------
+        timings : dict
+            Seconds for the best parse of the sample, keyed by engine name.
+        """
+        if file_name is None:
+            sample = NetworkLogParser.example_log_bytes()
+        else:
+            with NetworkLogParser.open_log(file_name) as f:
+                sample = f.read(sample_bytes)
+            sample = sample[:sample.rfind(b'\n') + 1]
+        sample = NetworkLogParser.strip_header(sample)
+
+        timings = {}
+        for engine in NetworkLogParser.available_engines():
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                NetworkLogParser.parse_bytes(sample, engine)
+                best = min(best, time.perf_counter() - start)
+            timings[engine] = best
+
+        print('Parse engine benchmark (seconds): ' + ', '.join(f'{k}={v:.4f}' for k, v in timings.items()))
+        return timings
+
+    @staticmethod
+    def example_log_bytes(num_lines=20000):
+        """Create log lines in the same format as data_log_files/weight_node_node.txt for benchmarking."""
+        rng = np.random.default_rng(0)
+        lines = [f'{rng.integers(1, 100):4d} 10.12.{rng.integers(0, 8)}.{rng.integers(0, 256)} '
+                 f'10.12.{rng.integers(0, 8)}.{rng.integers(0, 256)}\n' for _ in range(num_lines)]
+        return ''.join(lines).encode()
+
+    @staticmethod
+    def has_header(first_line):
+        """Check if the first line of a log is a header line.
+
+        Parameters
+        ----------
+        first_line : bytes
+            First line of a log file.
+
+        Returns
+        -------
+        header : bool
+            True if the first token is not an integer (e.g. 'fails sender receiver').
+        """
+        tokens = first_line.split()
+        return bool(tokens) and not tokens[0].isdigit()
+
+    @staticmethod
+    def strip_header(data):
+        """Remove the header line from the start of log bytes if there is one."""
+        first_line, newline, rest = data.partition(b'\n')
+        return rest if NetworkLogParser.has_header(first_line) else data
+
+    @staticmethod
+    def remove_text_lines(data):
+        """Remove lines that do not start with an integer (e.g. header lines) from log bytes."""
+        return re.sub(rb'(?m)^[ \t]*[^0-9 \t\r\n][^\n]*(\n|$)', b'', data)
+
+    @staticmethod
+    def parse_file(file_name, engine='auto'):
+        """Parse a whole log file.
+
+        The header line is detected from the first line of the file, so logs with and without
+        a header are both read in a single pass.
+
+        Parameters
+        ----------
+        file_name : str
+            Filename of network failure log, optionally compressed (see open_log).
+        engine : str
+            'auto' or one of available_engines().
+
+        Returns
+        -------
+        fails : numpy.ndarray of int64
+            Number of fails of each line.
+        sender, receiver : numpy.ndarray of uint32
+            ip address of the sender/receiver of each line (see ip_to_int).
+        """
+        engine = NetworkLogParser.select_engine(engine, file_name)
+        compression = NetworkLogParser.detect_compression(file_name)
+
+        if compression is None:
+            with open(file_name, 'rb') as f:
+                header = NetworkLogParser.has_header(f.readline())
+            if engine == 'pandas':
+                return NetworkLogParser.parse_pandas(file_name, header)
+            if engine == 'pyarrow':
+                return NetworkLogParser.parse_pyarrow(file_name, header)
+
+        # Plain logs parsed by the numpy engine and compressed logs of every engine are streamed in blocks,
+        # so neither the whole text nor the whole decompressed log is held in memory
+        with NetworkLogParser.open_log(file_name) as f:
+            blocks = NetworkLogParser.iter_blocks(f, NetworkLogParser.numpy_block_bytes)
+            return NetworkLogParser.concatenate_columns([NetworkLogParser.parse_bytes(b, engine) for b in blocks])
+
+    @staticmethod
+    def detect_compression(file_name):
+        """Detect the compression format of a log file from its magic bytes.
+
+        Returns
+        -------
+        compression : None|str
+            None for an uncompressed log, otherwise 'gzip', 'bz2', 'xz' or 'zstd'.
+        """
+        with open(file_name, 'rb') as f:
+            magic = f.read(6)
+        for compression, prefix in NetworkLogParser.compression_magic.items():
+            if magic.startswith(prefix):
+                return compression
+        return None
+
+    @staticmethod
+    def open_log(file_name, workers=None):
+        """Open a log file for reading, decompressing it on the fly if it is compressed.
+
+        Parameters
+        ----------
+        file_name : str
+            Filename of network failure log.  gzip, bz2, xz and zstd (requires zstandard) logs are
+            detected from their magic bytes.
+        workers : None|int
+            Number of threads decompressing gzip members or zstd frames in parallel.
+            None uses one per cpu.
+
+        Returns
+        -------
+        handle : binary file object
+            Stream of the uncompressed log bytes.  The decompressed log is never held in memory as a whole.
+
+        Notes
+        -------
+        1. gzip logs made of several members (e.g. appended gzip chunks, bgzip) and zstd logs made of
+            several frames (e.g. zstd -T or appended frames) are decompressed a few members/frames ahead
+            in a thread pool, zlib and zstd release the GIL while decompressing.
+        2. Single member gzip, bz2 and xz logs are decompressed in a single stream.
+        """
+        compression = NetworkLogParser.detect_compression(file_name)
+        if compression is None:
+            return open(file_name, 'rb')
+        if compression == 'bz2':
+            return bz2.open(file_name, 'rb')
+        if compression == 'xz':
+            return lzma.open(file_name, 'rb')
+        if compression == 'zstd' and zstandard is None:
+            raise Exception(f'The zstandard package is required to read {file_name}')
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunks = NetworkLogParser.iter_decompressed(file_name, compression, workers)
+        return io.BufferedReader(DecompressedStream(chunks), buffer_size=1 << 20)
+
+    @staticmethod
+    def iter_decompressed(file_name, compression, workers):
+        """Decompress a gzip or zstd log, members/frames are decompressed in parallel when possible.
+
+        Yields
+        ------
+        chunk : bytes
+            Consecutive pieces of the uncompressed log.
+        """
+        with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if compression == 'gzip':
+                starts = NetworkLogParser.gzip_member_candidates(buf)
+                if workers > 1 and len(starts) > 1:
+                    yield from NetworkLogParser.iter_gzip_members(buf, starts, workers)
+                    return
+                stream = gzip.GzipFile(fileobj=f, mode='rb')
+            else:
+                spans = NetworkLogParser.zstd_frame_spans(buf)
+                if workers > 1 and len(spans) > 1:
+                    decompress = NetworkLogParser.decompress_zstd_frame
+                    yield from NetworkLogParser.iter_ordered(pool_func=lambda span: decompress(buf, *span),
+                                                             items=spans, workers=workers)
+                    return
+                stream = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+
+            with stream:
+                while True:
+                    chunk = stream.read(1 << 22)
+                    if not chunk:
+                        break
+                    yield chunk
+
+    @staticmethod
+    def iter_ordered(pool_func, items, workers):
+        """Map pool_func over items in a thread pool, yielding results in order with a bounded look-ahead."""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = collections.deque()
+            for item in items:
+                futures.append(pool.submit(pool_func, item))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    @staticmethod
+    def gzip_member_candidates(buf):
+        """Find offsets that look like the start of a gzip member.
+
+        Compressed data can contain the same bytes as a member header, so some candidates
+        are false, see iter_gzip_members.
+        """
+        # ID1 ID2, CM=8 (deflate), FLG with reserved bits clear
+        return [m.start() for m in re.finditer(rb'\x1f\x8b\x08[\x00-\x1f]', buf)]
+
+    @staticmethod
+    def iter_gzip_members(buf, starts, workers):
+        """Decompress the members of a multi-member gzip log in parallel.
+
+        Parameters
+        ----------
+        buf : buffer
+            Compressed log bytes (e.g. a mmap of the log file).
+        starts : list of int
+            Candidate member offsets (see gzip_member_candidates), starting with 0.
+        workers : int
+            Number of threads.
+
+        Yields
+        ------
+        chunk : bytes
+            Consecutive pieces of the uncompressed members, in order.
+
+        Notes
+        -------
+        1. Candidates are decompressed speculatively a few at a time.  The member at the current offset
+            gives the offset of the next member, candidates between the two were false matches inside
+            compressed data and their (failed or unused) results are discarded.
+        2. Only the first gzip_piece_bytes of each candidate are decompressed in the pool.  The rest of a
+            larger member is streamed in pieces of gzip_piece_bytes, so a large member (e.g. a single member
+            log with false candidates) is never held in memory as a whole.
+        """
+        futures = {}
+        next_start = 0
+        offset = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            while offset < len(buf):
+                # Keep a few candidates after the current offset decompressing
+                while next_start < len(starts) and len(futures) < 2 * workers:
+                    if starts[next_start] >= offset:
+                        futures[starts[next_start]] = pool.submit(NetworkLogParser.decompress_gzip_member,
+                                                                  buf, starts[next_start],
+                                                                  max_bytes=NetworkLogParser.gzip_piece_bytes)
+                    next_start += 1
+
+                if offset not in futures:
+                    # gzip allows zero padding after the last member
+                    if not any(buf[offset:]):
+                        break
+                    raise Exception(f'Corrupt gzip member at byte {offset}')
+
+                chunk, end, decompressor = futures.pop(offset).result()
+                yield chunk
+                while decompressor is not None:
+                    chunk, end, decompressor = NetworkLogParser.decompress_gzip_member(
+                        buf, end, decompressor=decompressor, max_bytes=NetworkLogParser.gzip_piece_bytes)
+                    yield chunk
+                offset = end
+                for start in [s for s in futures if s < offset]:
+                    futures.pop(start).cancel()
+
+    @staticmethod
+    def decompress_gzip_member(buf, start, decompressor=None, max_bytes=1 << 24, feed_bytes=1 << 20):
+        """Decompress up to max_bytes of the gzip member starting at buf[start].
+
+        Parameters
+        ----------
+        buf : buffer
+            Compressed log bytes.
+        start : int
+            Offset of the member, or the offset returned by the previous call to continue a member.
+        decompressor : None|zlib decompression object
+            None to start a new member, or the decompressor returned by the previous call.
+        max_bytes : int
+            Maximum number of uncompressed bytes to return.
+        feed_bytes : int
+            Compressed bytes passed to the decompressor at a time.
+
+        Returns
+        -------
+        chunk : bytes
+            Uncompressed piece of the member.
+        end : int
+            Offset of the byte after the member, or the offset to continue from if the member is not done.
+        decompressor : None|zlib decompression object
+            None if the member is done, otherwise pass it back with end to decompress the next piece.
+        """
+        if decompressor is None:
+            decompressor = zlib.decompressobj(wbits=31)
+        chunks = []
+        size = 0
+        pos = start
+        # Views of buf are released right away, the log file can't be closed while a view exists
+        with memoryview(buf) as view:
+            while not decompressor.eof and size < max_bytes:
+                if pos >= len(buf):
+                    raise Exception(f'Truncated gzip member before byte {pos}')
+                with view[pos:pos + feed_bytes] as piece:
+                    chunk = decompressor.decompress(piece, max_bytes - size)
+                    # Input after the end of the member is left in unused_data, input past max_bytes in unconsumed_tail
+                    tail = decompressor.unused_data if decompressor.eof else decompressor.unconsumed_tail
+                    pos += len(piece) - len(tail)
+                chunks.append(chunk)
+                size += len(chunk)
+        return b''.join(chunks), pos, None if decompressor.eof else decompressor
+
+    @staticmethod
+    def zstd_frame_spans(buf):
+        """Find the (start, end) offsets of the zstd frames of a log without decompressing them.
+
+        Frame and block headers hold the size of every block, so frames can be walked header to header.
+        Skippable frames are left out.
+
+        See: https://github.com/facebook/zstd/blob/dev/doc/zstd_compression_format.md
+        """
+        spans = []
+        pos = 0
+        while pos + 4 <= len(buf):
+            magic = int.from_bytes(buf[pos:pos + 4], 'little')
+            if magic & 0xFFFFFFF0 == 0x184D2A50:
+                # Skippable frame: magic, 4 byte size, user data
+                pos += 8 + int.from_bytes(buf[pos + 4:pos + 8], 'little')
+                continue
+            if magic != 0xFD2FB528:
+                raise Exception(f'Corrupt zstd frame at byte {pos}')
+
+            start = pos
+            descriptor = buf[pos + 4]
+            fcs_flag = descriptor >> 6
+            single_segment = (descriptor >> 5) & 1
+            checksum = (descriptor >> 2) & 1
+            dict_id_size = (0, 1, 2, 4)[descriptor & 3]
+            fcs_size = (single_segment, 2, 4, 8)[fcs_flag]
+            pos += 5 + (0 if single_segment else 1) + dict_id_size + fcs_size
+
+            # Blocks: 3 byte header with last-block flag, block type and block size
+            last_block = False
+            while not last_block:
+                if pos + 3 > len(buf):
+                    raise Exception(f'Truncated zstd frame at byte {start}')
+                block_header = int.from_bytes(buf[pos:pos + 3], 'little')
+                last_block = bool(block_header & 1)
+                block_type = (block_header >> 1) & 3
+                block_size = block_header >> 3
+                pos += 3 + (1 if block_type == 1 else block_size)
+            pos += 4 * checksum
+            if pos > len(buf):
+                raise Exception(f'Truncated zstd frame at byte {start}')
+            spans.append((start, pos))
+        return spans
+
+    @staticmethod
+    def decompress_zstd_frame(buf, start, end):
+        """Decompress one zstd frame of buf."""
+        return zstandard.ZstdDecompressor().decompressobj().decompress(buf[start:end])
+
+    @staticmethod
+    def parse_bytes(data, engine='numpy'):
+        """Parse complete log lines held in memory.
+
+        Parameters
+        ----------
+        data : bytes
+            Newline terminated log lines without a header line.
+        engine : str
+            One of available_engines().
+
+        Returns
+        -------
+        fails, sender, receiver : numpy.ndarray
+            Same format as returned by parse_file.
+        """
+        if not data.strip():
+            return NetworkLogParser.empty_columns()
+        if engine == 'pandas':
+            return NetworkLogParser.parse_pandas(io.BytesIO(data), header=False)
+        if engine == 'pyarrow':
+            return NetworkLogParser.parse_pyarrow(pa.BufferReader(data), header=False)
+        return NetworkLogParser.parse_numpy(data)
+
+    @staticmethod
+    def iter_blocks(handle, block_bytes, strip_header=True):
+        """Read a binary file handle in blocks of complete lines.
+
+        Parameters
+        ----------
+        handle : binary file object
+            Log file opened in 'rb' mode.
+        block_bytes : int
+            Approximate number of bytes in each block.
+        strip_header : bool
+            Set to true to remove a header line from the start of the first block.
+
+        Yields
+        ------
+        block : bytes
+            Newline terminated lines.  Lines are never split across blocks.
+        """
+        remainder = b''
+        first = True
+        while True:
+            data = handle.read(block_bytes)
+            if not data:
+                break
+            data = remainder + data
+            cut = data.rfind(b'\n') + 1
+            block, remainder = data[:cut], data[cut:]
+            if first and strip_header and block:
+                block = NetworkLogParser.strip_header(block)
+                first = False
+            if block:
+                yield block
+
+        # The last line may not end with a newline
+        if remainder.strip():
+            yield NetworkLogParser.strip_header(remainder) if first and strip_header else remainder + b'\n'
+
+    @staticmethod
+    def concatenate_columns(parts):
+        """Concatenate (fails, sender, receiver) column tuples."""
+        if not parts:
+            return NetworkLogParser.empty_columns()
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    @staticmethod
+    def empty_columns():
+        """Columns of a log file without any lines."""
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32)
+
+    @staticmethod
+    def parse_pandas(source, header):
+        """Parse a log with the pandas C engine.
+
+        Parameters
+        ----------
+        source : str|file-like
+            Log filename or buffer.
+        header : bool
+            Set to true if the first line is a header line.
+
+        Returns
+        -------
+        fails, sender, receiver : numpy.ndarray
+            Same format as returned by parse_file.
+        """
+        log_df = pd.read_csv(source, delim_whitespace=True, engine='c', header=None,
+                             skiprows=1 if header else 0, names=['fails', 'sender', 'receiver'],
+                             usecols=[0, 1, 2], dtype={'fails': np.int64, 'sender': str, 'receiver': str})
+        return (log_df['fails'].to_numpy(), NetworkLogParser.ip_to_int(log_df['sender']),
+                NetworkLogParser.ip_to_int(log_df['receiver']))
+
+    @staticmethod
+    def parse_pyarrow(source, header):
+        """Parse a log with the pyarrow csv reader and compute kernels.
+
+        pyarrow's csv reader does not merge repeated delimiters, so each line is read as a single
+        string and split on whitespace with pyarrow compute kernels.
+
+        Parameters
+        ----------
+        source : str|pyarrow.NativeFile
+            Log filename or buffer.
+        header : bool
+            Set to true if the first line is a header line.
+
+        Returns
+        -------
+        fails, sender, receiver : numpy.ndarray
+            Same format as returned by parse_file.
+        """
+        table = pa_csv.read_csv(source,
+                                read_options=pa_csv.ReadOptions(column_names=['line'], skip_rows=1 if header else 0),
+                                parse_options=pa_csv.ParseOptions(delimiter='\x1f', quote_char=False),
+                                convert_options=pa_csv.ConvertOptions(column_types={'line': pa.string()}))
+        if table.num_rows == 0:
+            return NetworkLogParser.empty_columns()
+
+        # Skip whitespace-only lines, like the other engines
+        lines = pc.utf8_trim_whitespace(table['line'])
+        lines = pc.filter(lines, pc.not_equal(pc.utf8_length(lines), 0))
+        if len(lines) == 0:
+            return NetworkLogParser.empty_columns()
+        tokens = pc.utf8_split_whitespace(lines)
+        if not pc.all(pc.equal(pc.list_value_length(tokens), 3)).as_py():
+            raise Exception('Log lines must be in "fails sender receiver" format')
+
+        fails = pc.cast(pc.list_element(tokens, 0), pa.int64()).to_numpy()
+
+        def arrow_ip_to_int(addresses):
+            octets = pc.list_flatten(pc.split_pattern(addresses, '.'))
+            if len(octets) != 4 * len(addresses):
+                raise Exception('ip addresses must be in dotted quad format (e.g. 10.12.4.236)')
+            return NetworkLogParser.octets_to_int(pc.cast(octets, pa.uint32()).to_numpy().reshape(-1, 4))
+
+        return (fails, arrow_ip_to_int(pc.list_element(tokens, 1)),
+                arrow_ip_to_int(pc.list_element(tokens, 2)))
+
+    @staticmethod
+    def parse_numpy(data):
+        """Parse log lines with a bytes-level vectorized tokenizer.
+
+        Parameters
+        ----------
+        data : bytes
+            Log lines without a header line.
+
+        Returns
+        -------
+        fails, sender, receiver : numpy.ndarray
+            Same format as returned by parse_file.
+
+        Notes
+        -------
+        1. Each line holds exactly 9 runs of digits: fails, then the 4 octets of each ip address.
+            The runs are found from the digit mask of the raw bytes and their values are accumulated
+            one digit position at a time, so no Python object is created per line or per token.
+        2. The characters after each run are checked so that malformed lines raise an exception
+            rather than shifting every following field.
+        """
+        raw = np.frombuffer(data, dtype=np.uint8)
+        if len(raw) == 0:
+            return NetworkLogParser.empty_columns()
+
+        values, after = NetworkLogParser.digit_runs(raw)
+        if len(values) % 9:
+            raise Exception('Log lines must be in "fails sender receiver" format')
+
+        # Each octet except the last of an address must be followed by a dot, the other runs by whitespace
+        after = after.reshape(-1, 9)
+        dots = np.zeros(9, dtype=bool)
+        dots[[1, 2, 3, 5, 6, 7]] = True
+        if np.any((after[:, dots] != ord('.'))) or np.any(after[:, ~dots] > ord(' ')):
+            raise Exception('Log lines must be in "fails sender receiver" format')
+
+        values = values.reshape(-1, 9)
+        octets = values[:, 1:]
+        if np.any(octets > 255):
+            raise Exception('ip address octets must be in the range 0 to 255')
+        octets = octets.astype(np.uint32)
+        return (values[:, 0], NetworkLogParser.octets_to_int(octets[:, :4]),
+                NetworkLogParser.octets_to_int(octets[:, 4:]))
+
+    @staticmethod
+    def digit_runs(raw):
+        """Find the value of every run of decimal digits in a byte array.
+
+        Parameters
+        ----------
+        raw : numpy.ndarray of uint8
+            Text bytes.
+
+        Returns
+        -------
+        values : numpy.ndarray of int64
+            Integer value of each run of digits, in order.
+        after : numpy.ndarray of uint8
+            Byte following each run (a newline for a run at the end of raw).
+        """
+        # Find the start and end of every run of digits
+        is_digit = (raw >= ord('0')) & (raw <= ord('9'))
+        edges = np.diff(np.concatenate([[False], is_digit, [False]]).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        after = np.append(raw, np.uint8(ord('\n')))[ends]
+
+        # Accumulate the value of each run one digit position at a time
+        lengths = ends - starts
+        values = np.zeros(len(starts), dtype=np.int64)
+        for k in range(int(lengths.max()) if len(lengths) else 0):
+            active = np.flatnonzero(lengths > k)
+            values[active] = values[active] * 10 + (raw[starts[active] + k] - ord('0'))
+        return values, after
+
+    @staticmethod
+    def octets_to_int(octets):
+        """Combine an (n, 4) array of uint32 ip address octets into n uint32 ip addresses."""
+        return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+    @staticmethod
+    def ip_to_int(addresses):
+        """Convert dotted quad ip address strings to uint32 integers.
+
+        Parameters
+        ----------
+        addresses : array-like of str
+            ip addresses such as '10.12.4.236'.
+
+        Returns
+        -------
+        ints : numpy.ndarray of uint32
+            Integer ip addresses, so that integer order is ip address order.
+        """
+        # Join the addresses into one text buffer and tokenize it like a log file (see parse_numpy)
+        addresses = list(addresses)
+        raw = np.frombuffer('\n'.join(addresses).encode() + b'\n', dtype=np.uint8)
+        values, after = NetworkLogParser.digit_runs(raw)
+        if len(values) != 4 * len(addresses) or np.any(after.reshape(-1, 4)[:, :3] != ord('.')):
+            raise Exception('ip addresses must be in dotted quad format (e.g. 10.12.4.236)')
+        if np.any(values > 255):
+            raise Exception('ip address octets must be in the range 0 to 255')
+        return NetworkLogParser.octets_to_int(values.astype(np.uint32).reshape(-1, 4))
+
+    @staticmethod
+    def int_to_ip(ints):
+        """Convert uint32 integers to dotted quad ip address strings.
+
+        Parameters
+        ----------
+        ints : array-like of int
+            Integer ip addresses (see ip_to_int).
+
+        Returns
+        -------
+        addresses : list of str
+            ip addresses such as '10.12.4.236'.
+        """
+        ints = np.asarray(ints, dtype=np.uint32)
+        addresses = (ints >> 24).astype(str)
+        for shift in (16, 8, 0):
+            addresses = np.char.add(np.char.add(addresses, '.'), ((ints >> shift) & 255).astype(str))
+        return addresses.tolist()
+
+
+class DecompressedStream(io.RawIOBase):
+    """Read-only binary stream over an iterator of bytes chunks, see NetworkLogParser.open_log."""
+
+    def __init__(self, chunks):
+        """Initialize DecompressedStream.
+
+        Parameters
+        ----------
+        chunks : iterator of bytes
+            Consecutive pieces of the stream.
+        """
+        self.chunks = chunks
+        self.pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not len(self.pending):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.pending = memoryview(chunk)
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self):
+        # Stop the decompression generator so it closes the log file
+        if hasattr(self.chunks, 'close'):
+            self.chunks.close()
+        super().close()
@@ -0,0 +1,115 @@
+"""
+NetworkLogPlotData is the plot_data mapping of NetworkLogReader.  The plot data of each node
+is calculated the first time it is requested and the most recently used entries are cached.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import operator
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class NetworkLogPlotData(MutableMapping):
+    """Lazy plot data of a NetworkLogReader, see NetworkLogReader.calc_plot_data.
+
+    Notes
+    -------
+    1. String keys ('Node Ids', 'Node Names', 'Node Coordinates') hold plot data shared by every node
+        and are set when the plot data is created.
+    2. Node id keys are calculated by calc_node(n) when first requested and kept in a least recently used
+        cache of at most max_entries nodes, so memory use does not grow with the number of nodes viewed.
+    3. Entries are looked up, calculated and evicted under a lock, so the plot data can be read by widget
+        callbacks while a follow thread updates it.
+    """
+
+    def __init__(self, node_ids, calc_node, max_entries=256):
+        """Initialize NetworkLogPlotData.
+
+        Parameters
+        ----------
+        node_ids : range|sequence of int
+            Node ids that have plot data.
+        calc_node : callable
+            calc_node(n) returns the plot data of node id n.
+        max_entries : int
+            Maximum number of node entries kept in the cache.
+        """
+        self.node_ids = node_ids
+        self.calc_node = calc_node
+        self.max_entries = max_entries
+        self.shared = {}
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.shared[key]
+        key = operator.index(key)
+        if key not in self.node_ids:
+            raise KeyError(key)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            entry = self.calc_node(key)
+            self.store(key, entry)
+            return entry
+
+    def __setitem__(self, key, value):
+        if isinstance(key, str):
+            self.shared[key] = value
+        else:
+            with self.lock:
+                self.store(operator.index(key), value)
+
+    def __delitem__(self, key):
+        if isinstance(key, str):
+            del self.shared[key]
+        else:
+            with self.lock:
+                del self.cache[operator.index(key)]
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key in self.shared
+        try:
+            return operator.index(key) in self.node_ids
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        yield from self.shared
+        yield from self.node_ids
+
+    def __len__(self):
+        return len(self.shared) + len(self.node_ids)
+
+    def store(self, key, entry):
+        """Add an entry to the cache, evicting the least recently used entries beyond max_entries."""
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    def cached(self, key):
+        """True if the entry of node id key is in the cache (without calculating it or changing its use order)."""
+        with self.lock:
+            return operator.index(key) in self.cache
+
+    def cached_items(self):
+        """List of (node id, entry) pairs currently in the cache, least recently used first."""
+        with self.lock:
+            return list(self.cache.items())
+
+    def invalidate(self, node_ids=None):
+        """Drop cached entries so they are recalculated when requested, all entries if node_ids is None."""
+        with self.lock:
+            if node_ids is None:
+                self.cache.clear()
+            else:
+                for n in node_ids:
+                    self.cache.pop(operator.index(n), None)
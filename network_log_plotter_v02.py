@@ -7,16 +7,25 @@ Created on: 2020/09/10
 Copyright © 2020 Tony Held.  All rights reserved.
 """
 
+import threading
+
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import plotly.graph_objects as go
-import networkx as nx
+from plotly.io.json import to_json_plotly
 import ipywidgets as widgets
 
+try:
+    import networkx as nx
+except ImportError:     # networkx is optional, only plot_network1 needs it
+    nx = None
+
 import pprint
 pp = pprint.PrettyPrinter(indent=4)     # pretty printer
 
 from network_log_reader_v02 import NetworkLogReader
+from network_log_figure_updater_v01 import NetworkLogFigureUpdater
 
 
 class NetworkLogPlotter:
@@ -24,6 +33,21 @@ class NetworkLogPlotter:
 
     This can be converted into a module rather than a class if all methods stay static."""
 
+    # Hover text formatted by plotly from NetworkLogReader.node_customdata when hover='template',
+    # %{text} holds the connection information to the selected node (see NetworkLogReader.node_marker)
+    hover_template = ('%{customdata[0]} <-> All Nodes: Total=%{customdata[3]} '
+                      'Send=%{customdata[1]} Receive=%{customdata[2]}%{text}<extra></extra>')
+
+    # plot_network3 draws with WebGL (Scattergl) instead of SVG when backend='auto' and the number of
+    # nodes plus the most edges of any node is above this threshold (see select_backend)
+    webgl_threshold = 5000
+
+    # Print the bytes sent to the browser by each update_figure call
+    print_updates = False
+
+    # Number of most connected neighbours of the selected node prefetched by make_widgets (see prefetch_nodes)
+    prefetch_neighbours = 8
+
     @staticmethod
     def plot_cumulative_errors(sender_fails, receiver_fails):
         """Visualize the network errors as cumulative distribution plot
@@ -68,10 +92,12 @@ class NetworkLogPlotter:
         Parameters
         ----------
         nx_graph :
-            networkx.graph object
+            networkx.graph object, e.g. nlr.graph.to_networkx('Send')
         plot_data : dict
             plot_data object created by NetworkLogReader
         """
+        if nx is None:
+            raise Exception('networkx is required for plot_network1')
         plot_types = [nx.draw, nx.draw_networkx, nx.draw_kamada_kawai, nx.draw_spring]
 
         # plot using the networkx built-in drawing routines
@@ -90,17 +116,61 @@ class NetworkLogPlotter:
         plt.show()
 
     @staticmethod
-    def plot_network3(nlr, plot_node, edge_type):
+    def plot_network2(nlr, plot_node, edge_type, min_weight=0.4, max_weight=3.0):
+        """Visualize the edges of a node with matplotlib.
+
+        Parameters
+        ----------
+        nlr : NetworkLogReader
+            Plot based on plot_data attribute.
+        plot_node: int
+            The node id of interest.
+        edge_type : ['Send', 'Receive', 'Send+Receive']
+            Type of connection to analyse.
+        min_weight, max_weight : float
+            Line widths range from min_weight to min_weight + max_weight (see NetworkLogReader.lines_to_shapes).
+
+        Notes
+        -------
+        1) All edges are drawn as a single LineCollection from nlr.edge_segments, without a per-edge loop.
+        """
+        segments, weights, widths = nlr.edge_segments(plot_node, edge_type)
+
+        fig, ax = plt.subplots(1)
+        ax.add_collection(LineCollection(segments, linewidths=min_weight + widths * max_weight,
+                                         colors='gray', zorder=1))
+        ax.scatter(nlr.plot_data['Node Coordinates'][0], nlr.plot_data['Node Coordinates'][1], s=4,
+                   c=nlr.plot_data['Node Color'][edge_type], cmap='Reds', zorder=2)
+        ax.set_title(f'{edge_type} fails of {nlr.node_name(plot_node)}')
+        ax.set_aspect('equal')
+        ax.autoscale_view()
+        plt.show()
+
+    @staticmethod
+    def plot_network3(nlr, plot_node, edge_type, hover='text', edges='traces', backend='auto'):
         """Visualize NetworkLogReader object with customized plotly routines.
 
         Parameters
         ----------
         nlr : NetworkLogReader
             Plot based on plot_data attribute.
-        plot_node: str
-            The node of interest (the one selected in the figure).
+        plot_node: int
+            The node id of interest (the one selected in the figure).
         edge_type : ['Send', 'Receive', 'Send+Receive']
             Type of connection to analyse.
+        hover : str
+            How the node hover text is created:
+                'text' - the complete hover text of every node is sent as text.
+                'template' - node names and fails are sent once as customdata and formatted by
+                             hover_template in the browser.  Only the connection information of the
+                             nodes connected to plot_node is sent as text, so figure updates are much smaller.
+        edges : str
+            How the edges of plot_node are drawn:
+                'traces' - one line trace per width class (see NetworkLogReader.lines_to_traces),
+                           a few traces are restyled when plot_node changes.
+                'shapes' - one layout shape per edge, slow to draw for nodes with many edges.
+        backend : str
+            'svg' (plotly Scatter), 'webgl' (plotly Scattergl) or 'auto' to select one with select_backend.
 
         Returns
         -------
@@ -109,31 +179,70 @@ class NetworkLogPlotter:
 
         Notes
         -------
+        1) The webgl backend draws the nodes and edge traces with WebGL, which stays interactive with
+            tens of thousands of nodes and hundreds of thousands of edges.  Layout shapes (edges='shapes')
+            are always drawn as SVG.
         """
         nlp = NetworkLogPlotter
+        webgl = nlp.select_backend(nlr, backend) == 'webgl'
 
         # Step 1.  Gather plot input based on nlr, node, edge_type
         # -------------------------------------------------------------
         # Lines that represent the edges between nodes
-        shapes = nlr.plot_data[plot_node][edge_type]['shape_data']
+        if edges == 'traces':
+            shapes = []
+            edge_traces = nlp.create_edge_traces(nlr.plot_data[plot_node][edge_type]['trace_data'], webgl)
+        elif edges == 'shapes':
+            shapes = nlr.lines_to_shapes(nlr.plot_data[plot_node][edge_type]['line_data'])
+            edge_traces = []
+        else:
+            raise Exception(f'Unknown edges: {edges}')
 
         # Node locations
         x_coord = nlr.plot_data['Node Coordinates'][0]
         y_coord = nlr.plot_data['Node Coordinates'][1]
 
-        # Node color and hover text
-        node_text = nlr.plot_data[plot_node][edge_type]['node_text']
-        node_color = nlr.plot_data[plot_node][edge_type]['node_color']
+        # Node color and hover text, composed from the shared node text and the overlay of plot_node
+        customdata = nlr.node_customdata() if hover == 'template' else None
+        node_text, node_color = nlr.node_marker(plot_node, edge_type, overlay_only=customdata is not None)
 
         # Step 2.  Create trace and figure with edge trace in the layout
         # -------------------------------------------------------------
-        node_trace = nlp.create_scatter(edge_type, node_color, node_text, x_coord, y_coord)
-        fig = nlp.create_figure(plot_node, node_trace, shapes);
+        node_trace = nlp.create_scatter(edge_type, node_color, node_text, x_coord, y_coord, customdata, webgl)
+        fig = nlp.create_figure(nlr.node_name(plot_node), node_trace, shapes, edge_traces);
+        # Remember what the figure shows, so update_figure only sends what changes
+        fig._network_state = {'plot_node': plot_node, 'edge_type': edge_type,
+                              'trace_data': nlr.plot_data[plot_node][edge_type]['trace_data']}
         fig.write_html("graphics/network_errors_v02.html")
         return fig
 
     @staticmethod
-    def create_scatter(edge_type, node_color, node_text, x_coord, y_coord):
+    def select_backend(nlr, backend='auto'):
+        """Select the plotly rendering backend of plot_network3.
+
+        Parameters
+        ----------
+        nlr : NetworkLogReader
+            Reader to be plotted.
+        backend : str
+            'svg', 'webgl' or 'auto'.
+
+        Returns
+        -------
+        backend : str
+            'svg' or 'webgl'.  'auto' selects 'webgl' if the number of nodes plus the most
+                'Send+Receive' edges of any node (the most lines a figure can show) is above webgl_threshold.
+        """
+        if backend == 'auto':
+            max_edges = int(np.diff(nlr.graph.matrix('Send+Receive').indptr).max(initial=0))
+            points = len(nlr.unique_nodes) + max_edges
+            backend = 'webgl' if points > NetworkLogPlotter.webgl_threshold else 'svg'
+        elif backend not in ('svg', 'webgl'):
+            raise Exception(f'Unknown backend: {backend}')
+        return backend
+
+    @staticmethod
+    def create_scatter(edge_type, node_color, node_text, x_coord, y_coord, customdata=None, webgl=False):
         """Create plotly scatterplot.
 
         Parameters
@@ -150,16 +259,27 @@ class NetworkLogPlotter:
             x coordinates of nodes
         y_coord : [float]
             y coordinates of nodes
+        customdata : None|numpy.ndarray
+            None to show node_text as hover text.
+            Per-node values from NetworkLogReader.node_customdata to format the hover text with
+                hover_template, node_text is then appended to it.
+        webgl : bool
+            Create a WebGL go.Scattergl instead of an SVG go.Scatter.
 
         Returns
         -------
-        scatter : plotly.graph_objs._scatter.Scatter
+        scatter : plotly.graph_objs._scatter.Scatter|plotly.graph_objs._scattergl.Scattergl
             plotly scatter plot
         """
-        scatter = go.Scatter(
+        if customdata is None:
+            hover = dict(hoverinfo='text')
+        else:
+            hover = dict(customdata=customdata, hovertemplate=NetworkLogPlotter.hover_template)
+        scatter_type = go.Scattergl if webgl else go.Scatter
+        scatter = scatter_type(
             x=x_coord, y=y_coord,
             mode='markers',
-            hoverinfo='text',
+            **hover,
             text=node_text,
             marker=dict(
                 showscale=True,
@@ -181,24 +301,52 @@ class NetworkLogPlotter:
         return scatter
 
     @staticmethod
-    def create_figure(plot_node, node_trace, my_shapes):
-        """Create a plotly figure based on node trace and edge shape
+    def create_edge_traces(trace_data, webgl=False):
+        """Create a plotly line trace for each width class of edges.
+
+        Parameters
+        ----------
+        trace_data : list of dict
+            Line coordinates and width of each class, see NetworkLogReader.lines_to_traces.
+        webgl : bool
+            Create WebGL go.Scattergl traces instead of SVG go.Scatter traces.
+
+        Returns
+        -------
+        traces : list of plotly.graph_objs._scatter.Scatter|plotly.graph_objs._scattergl.Scattergl
+            Line traces without hover information, thinnest first.
+        """
+        scatter_type = go.Scattergl if webgl else go.Scatter
+        traces = []
+        for line_class in trace_data:
+            traces.append(scatter_type(
+                x=line_class['x'], y=line_class['y'],
+                mode='lines',
+                hoverinfo='skip',
+                line=dict(color='rgb(50, 171, 96)', width=line_class['width'])))
+        return traces
+
+    @staticmethod
+    def create_figure(plot_node, node_trace, my_shapes, edge_traces=()):
+        """Create a plotly figure based on node trace and edge shape or edge traces
 
         Parameters
         ----------
         plot_node: str
-            The node of interest (the one selected in the figure).
+            Display name of the node of interest (the one selected in the figure).
         node_trace : plotly.graph_objs._scatter.Scatter
             Scatter plot of node location
         my_shapes : [dict]
             Shape objects suitable for plotly layout inclusion.
+        edge_traces : [plotly.graph_objs._scatter.Scatter]
+            Edge line traces (see create_edge_traces), drawn below node_trace.
 
         Returns
         -------
         fig : plotly.graph_objs._figurewidget.FigureWidget
-            Figure widget capable of responding to click events
+            Figure widget capable of responding to click events, node_trace is the last trace
         """
-        fig = go.FigureWidget(data=[node_trace],
+        fig = go.FigureWidget(data=[*edge_traces, node_trace],
                          layout=go.Layout(
                              title=f'Interactive Graph of Network Failures<br>Selected Node: {plot_node}',
                              titlefont_size=16,
@@ -217,40 +365,96 @@ class NetworkLogPlotter:
         return fig
 
     @staticmethod
-    def update_figure(fig, nlr, plot_node, edge_type):
+    def update_figure(fig, nlr, plot_node, edge_type, force=False):
         """Update network figure based on change in plot_node and/or edge_type.
 
         Parameters
         ----------
         fig : plotly.graph_objs._figurewidget.FigureWidget
-            Original figure created by create_figure(...)
+            Original figure created by plot_network3(...)
         nlr : NetworkLogReader
             Plot based on plot_data attribute.
-        plot_node: str
-            The node of interest (the one selected in the figure).
+        plot_node: int
+            The node id of interest (the one selected in the figure).
         edge_type : ['Send', 'Receive', 'Send+Receive']
             Type of connection to analyse.
-        """
-
-        # Lines that represent the edges between nodes
-        my_shapes = nlr.plot_data[plot_node][edge_type]['shape_data']
+        force : bool
+            Set to true to resend every property, e.g. after the data of nlr changed (see follow_log).
+            The node coordinates are resent too if they changed (e.g. nlr was rebuilt with new nodes).
 
-        # Node color and hover text
-        node_text = nlr.plot_data[plot_node][edge_type]['node_text']
-        node_color = nlr.plot_data[plot_node][edge_type]['node_color']
-
-        # update scatter trace
-        scatter = fig.data[0]
-        scatter.text = node_text
-        scatter.marker.color = node_color
-        scatter.marker.colorbar.title = f'Num of Failures<br>{edge_type}'
+        Returns
+        -------
+        payload_bytes : dict
+            Size of the JSON of each property sent to the browser, keyed by property path (e.g. 'data[-1].text').
 
-        # update figure layout
-        fig.layout.title = f'Interactive Graph of Network Failures<br>Selected Node: {plot_node}'
-        fig.layout.shapes = my_shapes
+        Notes
+        -------
+        1) The plot_node and edge_type of the last update are kept with the figure (fig._network_state)
+            and only the properties that depend on what changed are sent:
+                plot_node - hover text, title and edges.
+                edge_type - node colors, colorbar title and edges.
+        2) The changes are sent in a single message with fig.batch_update().
+        3) If print_updates is set the payload bytes of each update are printed.
+        """
+        state = getattr(fig, '_network_state', {})
+        node_changed = force or state.get('plot_node') != plot_node
+        type_changed = force or state.get('edge_type') != edge_type
+
+        # Node color and hover text, composed from the shared node text and the overlay of plot_node
+        # If plotly formats the hover text (see plot_network3) only the overlay is sent
+        scatter = fig.data[-1]
+        changes = []
+        if node_changed or type_changed:
+            node_text, node_color = nlr.node_marker(plot_node, edge_type,
+                                                    overlay_only=scatter.customdata is not None)
+        if node_changed:
+            changes.append(('data[-1].text', scatter, 'text', node_text))
+            changes.append(('layout.title.text', fig.layout.title, 'text',
+                            f'Interactive Graph of Network Failures<br>Selected Node: {nlr.node_name(plot_node)}'))
+        if type_changed:
+            changes.append(('data[-1].marker.color', scatter.marker, 'color', node_color))
+            changes.append(('data[-1].marker.colorbar.title.text', scatter.marker.colorbar.title, 'text',
+                            f'Num of Failures<br>{edge_type}'))
+        if force and scatter.customdata is not None:
+            # Fails of the nodes are only sent to the browser as customdata
+            changes.append(('data[-1].customdata', scatter, 'customdata', nlr.node_customdata()))
+        if force:
+            x, y = nlr.plot_data['Node Coordinates']
+            if not (np.array_equal(scatter.x, x) and np.array_equal(scatter.y, y)):
+                changes.append(('data[-1].x', scatter, 'x', x))
+                changes.append(('data[-1].y', scatter, 'y', y))
+
+        # Lines that represent the edges between nodes, restyling only the edge traces that changed
+        if node_changed or type_changed:
+            edge_traces = fig.data[:-1]
+            if edge_traces:
+                trace_data = nlr.plot_data[plot_node][edge_type]['trace_data']
+                last_trace_data = state.get('trace_data')
+                if force or last_trace_data is None:
+                    last_trace_data = [None] * len(trace_data)
+                for i, (trace, line_class, last_class) in enumerate(zip(edge_traces, trace_data, last_trace_data)):
+                    if last_class is None or line_class['x'] != last_class['x'] or \
+                            line_class['y'] != last_class['y']:
+                        changes.append((f'data[{i}].x', trace, 'x', line_class['x']))
+                        changes.append((f'data[{i}].y', trace, 'y', line_class['y']))
+                state['trace_data'] = trace_data
+            else:
+                shapes = nlr.lines_to_shapes(nlr.plot_data[plot_node][edge_type]['line_data'])
+                changes.append(('layout.shapes', fig.layout, 'shapes', shapes))
+
+        with fig.batch_update():
+            for path, obj, prop, value in changes:
+                obj[prop] = value
+
+        fig._network_state = dict(state, plot_node=plot_node, edge_type=edge_type)
+
+        payload_bytes = {path: len(to_json_plotly(value)) for path, obj, prop, value in changes}
+        if NetworkLogPlotter.print_updates:
+            print(f'update_figure sent {sum(payload_bytes.values())} bytes: {payload_bytes}')
+        return payload_bytes
 
     @staticmethod
-    def make_widgets(nlr, fig):
+    def make_widgets(nlr, fig, debounce=None, prefetch=True):
         """
         Create widgets for interactive figure created with plot_network3.
 
@@ -262,14 +466,40 @@ class NetworkLogPlotter:
         fig : plotly.graph_objs._figurewidget.FigureWidget
             Figure to receive interactive widgets
 
+        debounce : None|float
+            Seconds the widgets must be still before the figure is updated, None to update as soon as possible.
+
+        prefetch : bool
+            Calculate the plot data of the nodes likely to be selected next (see prefetch_nodes) while the
+            figure is idle.  The fraction of updates that found their node cached is fig._network_updater.hit_rate().
+
         Returns
         --------
+
+        Notes
+        -------
+        1) The widget handlers only request figure updates from a NetworkLogFigureUpdater (fig._network_updater),
+            which renders the latest request in a background thread.  Dragging the slider over many nodes
+            drops the intermediate nodes instead of queueing an update for each of them.
+        2) The updater of earlier widgets of fig (e.g. a notebook cell that was run again) is closed.
         """
         # Create interactive widgets/callback to create interactive network figure
+        def prefetch_tasks(plot_node, edge_type):
+            # Looking a node up in plot_data calculates and caches its plot data
+            for node in NetworkLogPlotter.prefetch_nodes(nlr, plot_node):
+                yield lambda node=node: nlr.plot_data[node]
+
+        if getattr(fig, '_network_updater', None) is not None:
+            fig._network_updater.close()
+        updater = NetworkLogFigureUpdater(
+            lambda plot_node, edge_type, force: NetworkLogPlotter.update_figure(fig, nlr, plot_node, edge_type, force),
+            debounce, prefetch_tasks if prefetch else None,
+            # Look plot_data up on each call, a followed log replaces it when it is rebuilt (see follow_log)
+            lambda plot_node: nlr.plot_data.cached(plot_node))
+        fig._network_updater = updater
 
         edge_types = ['Send', 'Receive', 'Send+Receive']
-        node_names = list(nlr.unique_nodes)
-        num_nodes = len(node_names)
+        num_nodes = len(nlr.unique_nodes)
 
         # Figure widgets, create them with a dummy state and then
         # change the value to invoke the event handler before first use
@@ -295,16 +525,16 @@ class NetworkLogPlotter:
 
         # widget handlers
         def on_slider_value_change(change):
-            new_node_number = change['new']
-            new_node_name = node_names[new_node_number]
-            slider_label.value = f'Node Name: {new_node_name}'
-            NetworkLogPlotter.update_figure(fig, nlr, plot_node=new_node_name, edge_type=drop.value)
+            # Look the node up in nlr each time since a followed log can add nodes (see follow_log)
+            new_node_id = nlr.unique_nodes[change['new']]
+            slider_label.value = f'Node Name: {nlr.node_name(new_node_id)}'
+            updater.request(new_node_id, drop.value)
 
         def on_drop_value_change(change):
             new_edge_type = change['new']
             drop_label.value = f'Error Type:  {new_edge_type}'
-            node_name = node_names[slider.value]
-            NetworkLogPlotter.update_figure(fig, nlr, plot_node=node_name, edge_type=new_edge_type)
+            node_id = nlr.unique_nodes[slider.value]
+            updater.request(node_id, new_edge_type)
 
         slider.observe(on_slider_value_change, names='value')
         drop.observe(on_drop_value_change, names='value')
@@ -319,7 +549,77 @@ class NetworkLogPlotter:
             node_id = points.point_inds[0]
             slider.value = node_id
 
-        scatter = fig.data[0]
+        scatter = fig.data[-1]
         scatter.on_click(update_point)
 
         return node_hb, drop
+
+    @staticmethod
+    def prefetch_nodes(nlr, plot_node):
+        """Node ids likely to be selected after plot_node, most likely first.
+
+        Parameters
+        ----------
+        nlr : NetworkLogReader
+            Reader shown in the figure.
+        plot_node: int
+            The node id of interest (the one selected in the figure).
+
+        Returns
+        -------
+        nodes : list of int
+            The next and previous node of the slider, followed by the prefetch_neighbours nodes with
+                the most 'Send+Receive' fails with plot_node (the thickest lines to click on).
+                Nodes whose plot data is already cached are left out.
+        """
+        nodes = [n for n in (plot_node + 1, plot_node - 1) if n in nlr.plot_data]
+        neighbours, weights = nlr.graph.edges(plot_node, 'Send+Receive')
+        num_neighbours = min(NetworkLogPlotter.prefetch_neighbours, len(neighbours))
+        if num_neighbours:
+            top = np.argpartition(-weights, num_neighbours - 1)[:num_neighbours]
+            nodes += neighbours[top[np.argsort(-weights[top], kind='stable')]].tolist()
+        return [n for n in dict.fromkeys(nodes) if n != plot_node and not nlr.plot_data.cached(n)]
+
+    @staticmethod
+    def follow_log(nlr, fig, node_hb, drop, poll_interval=2.0):
+        """Keep an interactive figure in sync with a log file that is still being written.
+
+        Parameters
+        ----------
+        nlr : NetworkLogReader
+            Reader of the log file to follow, see NetworkLogReader.follow_log_file.
+        fig : plotly.graph_objs._figurewidget.FigureWidget
+            Figure created by plot_network3.
+        node_hb, drop :
+            Widgets created by make_widgets.
+        poll_interval : float
+            Seconds between checks for appended lines.
+
+        Returns
+        -------
+        thread : threading.Thread
+            Daemon thread following the log.
+        """
+        slider = node_hb.children[0]
+
+        # New nodes rebuild the node table and shift the node ids, so remember the ip address of the
+        # selected node to select the same node again after a rebuild
+        selected = {'address': nlr.node_addresses[nlr.unique_nodes[slider.value]]}
+
+        def on_slider_value_change(change):
+            selected['address'] = nlr.node_addresses[nlr.unique_nodes[change['new']]]
+
+        def on_log_update(nlr, changed_nodes, rebuilt):
+            if rebuilt:
+                slider.max = len(nlr.unique_nodes) - 1
+                slider.value = int(np.searchsorted(nlr.node_addresses, selected['address']))
+            # The fails and edges changed, resend everything.  The updater thread also sends the node
+            # locations moved by a rebuild, so the figure is only ever changed by that thread
+            fig._network_updater.request(nlr.unique_nodes[slider.value], drop.value, force=True)
+
+        slider.observe(on_slider_value_change, names='value')
+        thread = threading.Thread(target=nlr.follow_log_file,
+                                  kwargs={'poll_interval': poll_interval, 'callback': on_log_update},
+                                  daemon=True)
+        thread.start()
+        return thread
@@ -7,13 +7,33 @@ Created on: 2020/09/10
 Copyright © 2020 Tony Held.  All rights reserved.
 """
 
-import random
+import os
+import sys
+import mmap
+import glob
+import json
+import shutil
+import hashlib
+import time
+import tempfile
+import concurrent.futures
 from math import ceil
 
 import pandas as pd
 import numpy as np
-import networkx as nx
-import ipaddress    # for sorting ip addresses
+
+try:
+    import networkx as nx
+except ImportError:     # networkx is optional, only the networkx layouts need it
+    nx = None
+
+from network_log_parsers_v01 import NetworkLogParser
+from network_log_graph_v01 import NetworkLogGraph
+from network_log_tables_v01 import NodeTable, EdgeTable, NodeValueView, NodePositionView
+from network_log_plot_data_v01 import NetworkLogPlotData
+from network_log_layouts_v01 import NetworkLogLayouts
+from network_log_layout_store_v01 import NetworkLogLayoutStore
+from network_log_sketch_v01 import NetworkLogSketch
 
 import pprint
 pp = pprint.PrettyPrinter(indent=4)     # pretty printer
@@ -21,40 +41,97 @@ pp = pprint.PrettyPrinter(indent=4)     # pretty printer
 
 class NetworkLogReader:
     """Read server error logfile and its process results."""
-    def __init__(self, file_name, max_lines=None):
+
+    # Log files read when file_name is a directory (see find_log_files)
+    log_file_pattern = 'weight_node_node*'
+
+    # numpy columns saved in the parsed column cache (see save_log_cache)
+    cache_columns = ('fails', 'sender_id', 'receiver_id', 'node_addresses')
+
+    # Plot data to consider for visualization
+    edge_types = ['Send', 'Receive', 'Send+Receive']
+
+    # Maximum number of nodes whose plot data is kept (see calc_plot_data)
+    plot_cache_size = 256
+
+    # Seed of the random noise of the rectangular grid layout, so a log is always laid out the same way
+    layout_seed = 0
+
+    # Number of line widths the edges are quantized to when drawn as plotly traces (see lines_to_traces)
+    edge_width_classes = 5
+
+    def __init__(self, file_name, max_lines=None, chunk_size=None, use_cache=True, cache_dir=None, workers=None,
+                 engine='auto', top_nodes=None, top_by='total', min_edge_fails=None, lean=False, layout_store=None):
         """Initialize NetworkLogReader.
 
         Parameters
         ----------
-        file_name : str
-            Filename of network failure log.
+        file_name : str|list of str
+            Filename of network failure log, or several logs, see find_log_files for details.
 
         max_lines : Non|int
             Maximum number of lines read from the failure log.
             Use None unless debugging, see read_log_file for details.
+
+        chunk_size : None|int
+            Number of lines streamed from the failure log at a time.
+            Use None for small logs, see read_log_file for details.
+
+        use_cache : bool
+            Reuse the parsed columns of an unchanged log file, see read_log_file for details.
+
+        cache_dir : None|str
+            Directory of the parsed column cache, see log_cache_path for details.
+
+        workers : None|int
+            Number of processes used to parse multiple log files, see read_log_files for details.
+
+        engine : str
+            Parse engine for the log files, see read_log_file for details.
+
+        top_nodes : None|int
+            Only keep the edges of the top_nodes worst nodes, see read_log_file for details.
+
+        top_by : str
+            Fails used to rank the worst nodes, see read_log_file for details.
+
+        min_edge_fails : None|int
+            Also keep the edges with at least min_edge_fails fails, see read_log_file for details.
+
+        lean : bool
+            Free intermediate data once it has been processed, see read_log_file for details.
+
+        layout_store : None|str|NetworkLogLayoutStore
+            Reuse the node locations of earlier logs, see layout_network for details.
         """
-        self.read_log_file(file_name, max_lines)
+        self.read_log_file(file_name, max_lines, chunk_size, use_cache, cache_dir, workers, engine,
+                           top_nodes, top_by, min_edge_fails, lean)
 
-        # Create networkx objects and find the relation between nodes in the network
-        # self.initialize_network(max_edges=50)
+        # Create the sparse network graph and find the relation between nodes in the network
         self.initialize_network()
 
         # Organize the nodes in the network so they have a x, y coordinate representation.
-        self.layout_network(order_by_ip=True, rectangular_grid=True)
+        self.layout_network(order_by_ip=True, rectangular_grid=True, layout_store=layout_store)
 
         # Calculate additional plot features (edge locations) and annotations based on the network layout.
         self.calc_plot_data()
 
-    def read_log_file(self, file_name, max_lines=None):
+    def read_log_file(self, file_name, max_lines=None, chunk_size=None, use_cache=True, cache_dir=None,
+                      workers=None, engine='auto', top_nodes=None, top_by='total', min_edge_fails=None,
+                      lean=False):
         """Read network error data from file_name and process key statistics.
 
-        This function uses panda to read the text file, create pivot tables, and store
-        key statistics in numpy variables.
+        This function parses the text file into numpy columns (see NetworkLogParser),
+        ranks the nodes by fails, and stores key statistics in numpy variables.
 
         Parameters
         ----------
-        file_name : str
-            Filename of network failure log.
+        file_name : str|list of str
+            Filename of network failure log.  gzip, bz2, xz and zstd compressed logs are decompressed
+            on the fly (see NetworkLogParser.open_log).
+            A list of filenames, a directory or a glob pattern reads several logs as if they had been
+            concatenated (see find_log_files and read_log_files).  The files are parsed in parallel
+            and merged to one row per sender/receiver pair, self.panda_df is None.
 
         max_lines : None|int
             Maximum number of lines read from the failure log.  Use None unless debugging
@@ -63,58 +140,789 @@ class NetworkLogReader:
                 int - Only the last int lines of the read_log_file data are used.
                       If the log file was sorted ascending in number of errors,
                       using the last lines likely selects the the most poorly behaving nodes.
+
+        chunk_size : None|int
+            Number of lines read from the failure log at a time.
+                None - The whole log is read into memory at once.
+                int - The log is streamed in chunks of chunk_size lines and each chunk is
+                      folded into running per-edge sums (see read_log_chunks).
+                      self.panda_df then holds one row per sender/receiver pair rather than
+                      one row per line, so peak memory depends on the number of distinct
+                      edges rather than the length of the log.
+                      Can not be combined with max_lines.
+
+        use_cache : bool
+            Set to true to keep the parsed columns (fails, sender id, receiver id and the node table)
+            in an on-disk cache.  If file_name has not changed since it was cached the columns are
+            memory mapped from the cache instead of parsing the text log again, and self.panda_df is None.
+            See log_cache_path for how a cache entry is matched to a log file.
+
+        cache_dir : None|str
+            Directory of the parsed column cache, see log_cache_path for details.
+
+        workers : None|int
+            Number of processes used to parse multiple log files, see read_log_files for details.
+
+        engine : str
+            Parse engine, one of:
+                'auto' - the fastest available engine on a sample of the log (see NetworkLogParser.benchmark_engines).
+                'numpy' - bytes-level vectorized tokenizer.
+                'pandas' - pandas C engine with explicit dtypes.
+                'pyarrow' - pyarrow csv reader (requires pyarrow).
+            A header line is detected automatically, so logs with and without one parse the same way.
+
+        top_nodes : None|int
+            Reduce the network to its worst behaving nodes before it is built and plotted.
+                None - All nodes are kept.
+                int - Only the lines (or edges) with a sender or receiver among the top_nodes nodes
+                      with the most fails are kept (see select_top_edges).  Unlike max_lines this does
+                      not depend on the order of the log file.
+
+        top_by : str
+            Fails used to rank the nodes for top_nodes, one of 'send', 'receive' or 'total'.
+
+        min_edge_fails : None|int
+            Lines (or edges) with at least min_edge_fails fails are kept as well, whichever nodes they connect.
+            Without top_nodes only these lines are kept.
+
+        lean : bool
+            Set to true to keep only the node and edge tables (see process_columns) once they are created.
+            self.panda_df, self.pivot_sender and self.pivot_receiver are then None.  Columns loaded from the
+            parsed column cache stay memory mapped.  See memory_report for what each attribute costs.
         """
         self.file_name = file_name
+        self.lean = lean
+        self.parse_engine = engine
+
+        # The tail of the log is unknown until the whole file has been streamed
+        if chunk_size is not None and max_lines is not None:
+            raise Exception('max_lines can not be combined with chunk_size')
 
-        # Read in the network data file through panda
-        self.panda_df = pd.read_csv(self.file_name, delim_whitespace=True)
-        # print(self.panda_df.head())
+        log_files = self.find_log_files(file_name)
+        if isinstance(file_name, str) and os.path.isfile(file_name):
+            columns, self.panda_df = self.parse_log_file(file_name, chunk_size, use_cache, cache_dir, engine)
+        else:
+            # Lines of different files have no common order, so there is no tail to select
+            if max_lines is not None:
+                raise Exception('max_lines can not be combined with multiple log files')
+            columns = self.read_log_files(log_files, chunk_size, use_cache, cache_dir, workers, engine)
+            self.panda_df = None
+        self.log_files = log_files
+
+        fails = columns['fails']
+        sender_id = columns['sender_id']
+        receiver_id = columns['receiver_id']
+        node_addresses = columns['node_addresses']
+        self.line_count = columns['line_count']
 
         # Only examine a part of the log file if requested.
         if max_lines is not None:
-            self.panda_df = self.panda_df[-max_lines:]
-
-        # Create pivot tables of receiver and sender failures
-        self.pivot_receiver = self.panda_df.pivot_table(values='fails', index='receiver', aggfunc=np.sum)
-        self.pivot_receiver.sort_values(by=['fails'], inplace=True, ascending=False)
-        self.pivot_sender = self.panda_df.pivot_table(values='fails', index='sender', aggfunc=np.sum)
-        self.pivot_sender.sort_values(by=['fails'], inplace=True, ascending=False)
-        # print(pivot_receiver)
-        # print(pivot_sender)
-
-        # Export raw panda dataframes to numpy variables
-        # The node-order of these arrays is the same as that of the original datafile
-        self.fails = self.panda_df['fails'].to_numpy()
-        self.sender = self.panda_df['sender'].to_numpy()
-        self.receiver = self.panda_df['receiver'].to_numpy()
-        # Save logfile data as a tuples of tuples to prevent reordering/corruption of original data
-        self.raw_data = tuple(zip(self.sender, self.receiver, self.fails))
-
-        # Export panda pivot tables to numpy variables
-        # The order of these arrays is sorted descending by number of fails
-        self.sender_fails_name = self.pivot_sender.index.to_numpy()  # network name of sender
-        self.receiver_fails_name = self.pivot_receiver.index.to_numpy()  # network name of receiver
-        self.sender_fails_count = self.pivot_sender['fails'].to_numpy()  # number of fails from sender
-        self.receiver_fails_count = self.pivot_receiver['fails'].to_numpy()  # number of fails from receiver
-
-        # Save failures as dictionaries for later lookup
-        self.sender_fails_dict = dict(zip(self.sender_fails_name, self.sender_fails_count))
-        self.receiver_fails_dict = dict(zip(self.receiver_fails_name, self.receiver_fails_count))
-        self.total_fails_dict = self.add_dicts(self.sender_fails_dict, self.receiver_fails_dict)
-
-        # Find unique node names and sort them by ip address
-        self.unique_nodes = set(self.sender_fails_name).union(set(self.receiver_fails_name))
-        self.unique_nodes = sorted(self.unique_nodes, key=ipaddress.IPv4Address)
+            fails = fails[-max_lines:]
+            sender_id = sender_id[-max_lines:]
+            receiver_id = receiver_id[-max_lines:]
+            if self.panda_df is not None:
+                self.panda_df = self.panda_df[-max_lines:]
+            self.line_count = len(fails)
+
+            # Drop the nodes that are not part of the selected lines from the node table
+            node_addresses, sender_id, receiver_id = self.drop_unused_nodes(node_addresses, sender_id, receiver_id)
+
+        # Only keep the lines of the worst behaving nodes (and/or the heaviest lines) if requested.
+        if top_nodes is not None or min_edge_fails is not None:
+            keep = self.select_top_edges(fails, sender_id, receiver_id, len(node_addresses),
+                                         top_nodes, top_by, min_edge_fails)
+            print(f'{np.count_nonzero(keep)} of {len(keep)} lines kept '
+                  f'(top_nodes={top_nodes}, top_by={top_by}, min_edge_fails={min_edge_fails}).')
+            if not keep.any():
+                raise Exception('No lines left after selecting the top nodes, lower min_edge_fails')
+            fails = fails[keep]
+            sender_id = sender_id[keep]
+            receiver_id = receiver_id[keep]
+            if self.panda_df is not None:
+                self.panda_df = self.panda_df[keep]
+            node_addresses, sender_id, receiver_id = self.drop_unused_nodes(node_addresses, sender_id, receiver_id)
+
+        self.process_columns(fails, sender_id, receiver_id, node_addresses)
+        if lean:
+            # The node and edge tables hold everything derived from the DataFrame
+            self.panda_df = None
+        del fails, sender_id, receiver_id, node_addresses, columns
 
         # Print diagnostic information
-        print(f'{len(self.fails)} lines successfully read from file: {self.file_name}')
+        print(f'{self.line_count} lines successfully read from file: {self.file_name}')
         print(f'{np.sum(self.fails)} total errors detected.')
         print(f'A total of {len(self.unique_nodes)} unique nodes were detected in the log file')
-        print(f'{len(self.sender_fails_name)} nodes had send errors.')
-        print(f'{len(self.receiver_fails_name)} nodes had receive errors.')
+        print(f'{len(self.sender_fails_id)} nodes had send errors.')
+        print(f'{len(self.receiver_fails_id)} nodes had receive errors.')
 
         self.print_top_fails(25)
 
+    def process_columns(self, fails, sender_id, receiver_id, node_addresses):
+        """Store parsed log columns in the node and edge tables and calculate per-node fails and rankings.
+
+        Parameters
+        ----------
+        fails : numpy.ndarray
+            Number of fails of each line (or edge).
+        sender_id, receiver_id : numpy.ndarray of uint32
+            Node id of the sender/receiver of each line (or edge), indexing node_addresses.
+        node_addresses : numpy.ndarray of uint32
+            Sorted node table, see intern_columns.
+
+        Notes
+        -------
+        1. self.edge_table (one row per line, in the order of the original datafile) and
+            self.node_table (one row per node id) are the only copies of the parsed data.
+            Attributes such as self.fails, self.node_send_fails or self.node_addresses are their columns,
+            and the fails dictionaries are read-only views of them (see NodeValueView).
+        """
+        self.edge_table = EdgeTable(sender_id, receiver_id, fails)
+
+        # Sum the fails and count the lines of each node, indexed by node id
+        num_nodes = len(node_addresses)
+        self.node_table = NodeTable(node_addresses,
+                                    self.sum_by_node(self.sender_id, self.fails, num_nodes),
+                                    self.sum_by_node(self.receiver_id, self.fails, num_nodes),
+                                    np.bincount(self.sender_id, minlength=num_nodes),
+                                    np.bincount(self.receiver_id, minlength=num_nodes))
+
+        self.rank_fails()
+
+        # Node ids are already sorted by ip address
+        self.unique_nodes = range(num_nodes)
+
+    # Columns of the node and edge tables, see process_columns
+    node_addresses = property(lambda self: self.node_table.addresses, doc='uint32 ip address of each node id')
+    node_send_fails = property(lambda self: self.node_table.send_fails, doc='Summed send fails of each node id')
+    node_receive_fails = property(lambda self: self.node_table.receive_fails,
+                                  doc='Summed receive fails of each node id')
+    node_send_lines = property(lambda self: self.node_table.send_lines, doc='Number of lines sent by each node id')
+    node_receive_lines = property(lambda self: self.node_table.receive_lines,
+                                  doc='Number of lines received by each node id')
+    fails = property(lambda self: self.edge_table.fails, doc='Number of fails of each line')
+    sender_id = property(lambda self: self.edge_table.sender_id, doc='Node id of the sender of each line')
+    receiver_id = property(lambda self: self.edge_table.receiver_id, doc='Node id of the receiver of each line')
+    sender = property(lambda self: self.node_addresses[self.sender_id], doc='uint32 ip address of each sender')
+    receiver = property(lambda self: self.node_addresses[self.receiver_id], doc='uint32 ip address of each receiver')
+
+    def rank_fails(self):
+        """Rank the nodes that appear as senders/receivers descending by number of fails.
+
+        These replace the pivot tables of the panda dataframe.
+        """
+        self.sender_fails_id = self.rank_nodes(self.node_send_lines, self.node_send_fails)  # node id of sender
+        self.receiver_fails_id = self.rank_nodes(self.node_receive_lines, self.node_receive_fails)  # node id of receiver
+        self.sender_fails_count = self.node_send_fails[self.sender_fails_id]  # number of fails from sender
+        self.receiver_fails_count = self.node_receive_fails[self.receiver_fails_id]  # number of fails from receiver
+        if getattr(self, 'lean', False):
+            self.pivot_sender = None
+            self.pivot_receiver = None
+        else:
+            self.pivot_sender = pd.DataFrame({'fails': self.sender_fails_count},
+                                             index=pd.Index(self.sender_fails_id, name='sender'))
+            self.pivot_receiver = pd.DataFrame({'fails': self.receiver_fails_count},
+                                               index=pd.Index(self.receiver_fails_id, name='receiver'))
+
+        # Failures as dictionaries keyed by node id for later lookup, in ranked order
+        self.sender_fails_dict = NodeValueView(self.sender_fails_id, self.node_table.send_fails)
+        self.receiver_fails_dict = NodeValueView(self.receiver_fails_id, self.node_table.receive_fails)
+        self.total_fails_dict = NodeValueView(np.flatnonzero(self.node_send_lines + self.node_receive_lines),
+                                              self.node_table.send_fails, self.node_table.receive_fails)
+
+    @staticmethod
+    def parse_log_file(file_name, chunk_size=None, use_cache=True, cache_dir=None, engine='auto'):
+        """Parse a single log file into numpy columns, reusing the parsed column cache when possible.
+
+        Parameters
+        ----------
+        file_name : str
+            Filename of network failure log.
+        chunk_size : None|int
+            Number of lines read from the failure log at a time, see read_log_file for details.
+        use_cache : bool
+            Set to true to load/save the columns from/to the parsed column cache.
+        cache_dir : None|str
+            Directory of the parsed column cache, see log_cache_path for details.
+        engine : str
+            Parse engine, see NetworkLogParser.available_engines.  'auto' picks the fastest.
+
+        Returns
+        -------
+        columns : dict
+            'fails', 'sender_id', 'receiver_id' : numpy arrays with one entry per line
+                (one entry per sender/receiver pair if chunk_size is not None).
+            'node_addresses' : sorted uint32 node table, node ids index this table.
+            'line_count' : number of lines in the log file.
+        panda_df : None|pandas.DataFrame
+            DataFrame the columns were created from, None if they were loaded from the cache.
+        """
+        # Reuse previously parsed columns if the log file has not changed
+        cache_path = NetworkLogReader.log_cache_path(file_name, chunk_size, cache_dir) if use_cache else None
+        columns = NetworkLogReader.load_log_cache(cache_path) if cache_path is not None else None
+        if columns is not None:
+            print(f'Parsed columns loaded from cache: {cache_path}')
+            return columns, None
+
+        if chunk_size is None:
+            # Read in the network data file, the header line (if any) is detected from the first line
+            fails, sender, receiver = NetworkLogParser.parse_file(file_name, engine)
+            panda_df = pd.DataFrame({'fails': fails, 'sender': sender, 'receiver': receiver})
+            line_count = len(panda_df)
+            # print(panda_df.head())
+        else:
+            panda_df, line_count = NetworkLogReader.read_log_chunks(file_name, chunk_size, engine)
+
+        columns = NetworkLogReader.intern_columns(panda_df['fails'].to_numpy(), panda_df['sender'].to_numpy(),
+                                                  panda_df['receiver'].to_numpy(), line_count)
+        if cache_path is not None:
+            NetworkLogReader.save_log_cache(cache_path, columns)
+        return columns, panda_df
+
+    @staticmethod
+    def intern_columns(fails, sender, receiver, line_count):
+        """Intern the sender/receiver ip addresses into a node table and replace them with node ids.
+
+        Parameters
+        ----------
+        fails : numpy.ndarray
+            Number of fails of each line (or edge).
+        sender, receiver : numpy.ndarray of uint32
+            ip address of the sender/receiver of each line (or edge).
+        line_count : int
+            Number of lines in the log file(s).
+
+        Returns
+        -------
+        columns : dict
+            Same format as returned by parse_log_file.
+        """
+        # np.unique sorts the addresses, so node ids (positions in the table) are in ip address order
+        # and sorting nodes by ip address is an integer sort of their ids.
+        node_addresses = np.unique(np.concatenate([sender, receiver]))
+        return {'fails': EdgeTable.compact_counts(fails),
+                'sender_id': np.searchsorted(node_addresses, sender).astype(np.uint32),
+                'receiver_id': np.searchsorted(node_addresses, receiver).astype(np.uint32),
+                'node_addresses': node_addresses,
+                'line_count': line_count}
+
+    @staticmethod
+    def drop_unused_nodes(node_addresses, sender_id, receiver_id):
+        """Remove the nodes that no longer appear in the sender/receiver columns from the node table.
+
+        Returns
+        -------
+        node_addresses : numpy.ndarray of uint32
+            Node table of the nodes still in use, still sorted by ip address.
+        sender_id, receiver_id : numpy.ndarray of uint32
+            Node ids renumbered to index the new node table.
+        """
+        used_ids, new_ids = np.unique(np.concatenate([sender_id, receiver_id]), return_inverse=True)
+        return (node_addresses[used_ids],
+                new_ids[:len(sender_id)].astype(np.uint32),
+                new_ids[len(sender_id):].astype(np.uint32))
+
+    @staticmethod
+    def select_top_edges(fails, sender_id, receiver_id, num_nodes, top_nodes=None, top_by='total',
+                         min_edge_fails=None):
+        """Select the lines (or edges) of the worst behaving nodes.
+
+        Parameters
+        ----------
+        fails : numpy.ndarray
+            Number of fails of each line (or edge).
+        sender_id, receiver_id : numpy.ndarray of uint32
+            Node id of the sender/receiver of each line (or edge).
+        num_nodes : int
+            Number of nodes in the node table.
+        top_nodes : None|int
+            Number of nodes with the most fails whose lines are kept.
+        top_by : str
+            'send', 'receive' or 'total' fails of each node.
+        min_edge_fails : None|int
+            Lines with at least min_edge_fails fails are kept as well.
+
+        Returns
+        -------
+        keep : numpy.ndarray of bool
+            True for every line to keep.
+
+        Notes
+        -------
+        1. The worst nodes are found with np.argpartition, which is linear in the number of nodes,
+            instead of sorting every node by fails.  Nodes tied with the last selected node may or
+            may not be selected.
+        """
+        keep = np.zeros(len(fails), dtype=bool)
+        if top_nodes is not None:
+            if top_by not in ('send', 'receive', 'total'):
+                raise Exception(f"top_by must be 'send', 'receive' or 'total', not {top_by}")
+            node_fails = np.zeros(num_nodes, dtype=np.int64)
+            if top_by in ('send', 'total'):
+                node_fails += NetworkLogReader.sum_by_node(sender_id, fails, num_nodes)
+            if top_by in ('receive', 'total'):
+                node_fails += NetworkLogReader.sum_by_node(receiver_id, fails, num_nodes)
+
+            is_top = np.full(num_nodes, top_nodes >= num_nodes)
+            if 0 < top_nodes < num_nodes:
+                is_top[np.argpartition(node_fails, num_nodes - top_nodes)[num_nodes - top_nodes:]] = True
+            keep |= is_top[sender_id] | is_top[receiver_id]
+        if min_edge_fails is not None:
+            keep |= fails >= min_edge_fails
+        return keep
+
+    @staticmethod
+    def find_log_files(file_name):
+        """Expand a log file specification into a list of log files.
+
+        Parameters
+        ----------
+        file_name : str|list of str
+            One of:
+                filename of a single log file
+                list of log filenames
+                directory, every file matching log_file_pattern in it is used
+                glob pattern such as 'data_log_files/weight_node_node*.txt'
+
+        Returns
+        -------
+        log_files : list of str
+            Sorted log filenames.
+        """
+        if isinstance(file_name, (list, tuple)):
+            log_files = list(file_name)
+        elif os.path.isdir(file_name):
+            log_files = sorted(f for f in glob.glob(os.path.join(file_name, NetworkLogReader.log_file_pattern))
+                               if os.path.isfile(f))
+        elif os.path.isfile(file_name):
+            log_files = [file_name]
+        else:
+            log_files = sorted(glob.glob(file_name))
+
+        if not log_files:
+            raise Exception(f'No log files found for: {file_name}')
+        return log_files
+
+    @staticmethod
+    def read_log_files(log_files, chunk_size=None, use_cache=True, cache_dir=None, workers=None, engine='auto'):
+        """Parse several log files in parallel and merge them as if they had been concatenated.
+
+        Parameters
+        ----------
+        log_files : list of str
+            Filenames of network failure logs.
+        chunk_size, use_cache, cache_dir, engine :
+            Passed to parse_log_file for each file.
+        workers : None|int
+            Number of worker processes.  None uses one per cpu, 1 parses the files in this process.
+
+        Returns
+        -------
+        columns : dict
+            Same format as returned by parse_log_file with one entry per sender/receiver pair.
+
+        Notes
+        -------
+        1. Each worker parses one file and reduces it to per-edge sums (see aggregate_log_file),
+            so only the partial sums are sent back to this process.
+        2. Partial sums are merged by summing the fails of matching sender/receiver pairs.
+            The pairs, per-node sums and everything derived from them are the same as if
+            the files had been concatenated into one log.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(log_files)))
+
+        # Resolve 'auto' once here rather than benchmarking in every worker process
+        engine = NetworkLogParser.select_engine(engine, log_files[0])
+        tasks = [(f, chunk_size, use_cache, cache_dir, engine) for f in log_files]
+        if workers == 1:
+            partials = [NetworkLogReader.aggregate_log_file(*task) for task in tasks]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                partials = list(pool.map(NetworkLogReader.aggregate_log_file, *zip(*tasks)))
+        print(f'{len(log_files)} log files read with {workers} worker processes')
+
+        # Merge the partial per-edge sums of all files
+        sender, receiver, fails = NetworkLogReader.aggregate_edges(np.concatenate([p[0] for p in partials]),
+                                                                   np.concatenate([p[1] for p in partials]),
+                                                                   np.concatenate([p[2] for p in partials]))
+        line_count = sum(p[3] for p in partials)
+        return NetworkLogReader.intern_columns(fails, sender, receiver, line_count)
+
+    @staticmethod
+    def aggregate_log_file(file_name, chunk_size=None, use_cache=True, cache_dir=None, engine='auto'):
+        """Parse a log file and reduce it to per-edge sums.
+
+        This is the worker task of read_log_files.
+
+        Returns
+        -------
+        sender, receiver : numpy.ndarray of uint32
+            ip address of each unique sender/receiver pair.
+        fails : numpy.ndarray of int64
+            Summed fails of each pair.
+        line_count : int
+            Number of lines in the log file.
+        """
+        columns, _ = NetworkLogReader.parse_log_file(file_name, chunk_size, use_cache, cache_dir, engine)
+        node_addresses = columns['node_addresses']
+        sender, receiver, fails = NetworkLogReader.aggregate_edges(node_addresses[columns['sender_id']],
+                                                                   node_addresses[columns['receiver_id']],
+                                                                   columns['fails'])
+        return sender, receiver, fails, columns['line_count']
+
+    @staticmethod
+    def summarize_log_files(file_name, capacity=1000, chunk_size=1000000, workers=None, engine='auto'):
+        """Summarize the worst senders, receivers and edges of logs too large to read whole.
+
+        Unlike read_log_file nothing but the sketch is kept, so memory use does not grow
+        with the length of the logs or their number of distinct edges.
+
+        Parameters
+        ----------
+        file_name : str|list of str
+            Filename of network failure log, or several logs, see find_log_files for details.
+        capacity : int
+            Number of counters kept per table, see NetworkLogSketch.
+        chunk_size : int
+            Approximate number of lines parsed at a time, see iter_log_chunks.
+        workers : None|int
+            Number of worker processes.  None uses one per cpu, 1 summarizes the files in this process.
+        engine : str
+            Parse engine, see read_log_file for details.
+
+        Returns
+        -------
+        sketch : NetworkLogSketch
+            Approximate top senders, receivers and edges of all log files,
+            use sketch.print_top_fails() for a report.
+        """
+        log_files = NetworkLogReader.find_log_files(file_name)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(log_files)))
+
+        engine = NetworkLogParser.select_engine(engine, log_files[0])
+        tasks = [(f, capacity, chunk_size, engine) for f in log_files]
+        if workers == 1:
+            sketches = [NetworkLogReader.summarize_log_file(*task) for task in tasks]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                sketches = list(pool.map(NetworkLogReader.summarize_log_file, *zip(*tasks)))
+        print(f'{len(log_files)} log files summarized with {workers} worker processes')
+
+        sketch = sketches[0]
+        for other in sketches[1:]:
+            sketch.merge(other)
+        return sketch
+
+    @staticmethod
+    def summarize_log_file(file_name, capacity=1000, chunk_size=1000000, engine='auto'):
+        """Stream a log file into a NetworkLogSketch, this is the worker task of summarize_log_files."""
+        sketch = NetworkLogSketch(capacity)
+        for fails, sender, receiver in NetworkLogReader.iter_log_chunks(file_name, chunk_size, engine):
+            sketch.update(fails, sender, receiver)
+        return sketch
+
+    @staticmethod
+    def aggregate_edges(sender, receiver, fails):
+        """Sum the fails of lines with the same sender/receiver pair.
+
+        Parameters
+        ----------
+        sender, receiver : numpy.ndarray of uint32
+            ip address (or node id) of the sender/receiver of each line.
+        fails : numpy.ndarray
+            Number of fails of each line.
+
+        Returns
+        -------
+        sender, receiver : numpy.ndarray of uint32
+            Unique sender/receiver pairs sorted by sender, then receiver.
+        fails : numpy.ndarray of int64
+            Summed fails of each pair.
+        """
+        # Pack each pair into a single 64 bit key so pairs can be sorted and compared as integers
+        edge_key = (np.asarray(sender, dtype=np.uint64) << np.uint64(32)) | np.asarray(receiver, dtype=np.uint64)
+        order = np.argsort(edge_key, kind='stable')
+        edge_key = edge_key[order]
+        if len(edge_key) == 0:
+            starts = np.zeros(0, dtype=np.intp)
+            edge_fails = np.zeros(0, dtype=np.int64)
+        else:
+            starts = np.flatnonzero(np.concatenate([[True], edge_key[1:] != edge_key[:-1]]))
+            edge_fails = np.add.reduceat(np.asarray(fails, dtype=np.int64)[order], starts)
+        edge_key = edge_key[starts]
+        return ((edge_key >> np.uint64(32)).astype(np.uint32), (edge_key & np.uint64(0xFFFFFFFF)).astype(np.uint32),
+                edge_fails)
+
+    @staticmethod
+    def log_cache_path(file_name, chunk_size=None, cache_dir=None, sample_bytes=1 << 20):
+        """Find the parsed column cache entry of a log file.
+
+        Parameters
+        ----------
+        file_name : str
+            Filename of network failure log.
+        chunk_size : None|int
+            Streamed logs cache one row per edge instead of one row per line, so they have their own entry.
+        cache_dir : None|str
+            Directory holding the cache entries.
+            None - a .nlr_cache directory next to file_name is used.
+        sample_bytes : int
+            Number of bytes hashed from the start and from the end of the log file.
+
+        Returns
+        -------
+        cache_path : str
+            Directory of the cache entry.  It may not exist yet.
+
+        Notes
+        -------
+        1. The entry name is file_name.path_hash.mode.content_hash.  path_hash is a hash of the absolute path,
+            so logs with the same file name in different directories (e.g. one per host) sharing a cache_dir
+            have their own entries.  content_hash is a hash of the absolute path, size, modification time,
+            and the first and last sample_bytes of the file.
+            Any change to the log file gives a new entry name, so stale entries are never loaded.
+        2. Only the start and end of the file are hashed so the cache can be checked in milliseconds
+            on multi-GB logs.
+        """
+        file_path = os.path.abspath(file_name)
+        stat = os.stat(file_path)
+
+        key = hashlib.blake2b(digest_size=16)
+        key.update(f'{file_path}|{stat.st_size}|{stat.st_mtime_ns}'.encode())
+        with open(file_path, 'rb') as f:
+            key.update(f.read(sample_bytes))
+            if stat.st_size > sample_bytes:
+                f.seek(max(sample_bytes, stat.st_size - sample_bytes))
+                key.update(f.read(sample_bytes))
+
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(file_path), '.nlr_cache')
+        path_hash = hashlib.blake2b(file_path.encode(), digest_size=4).hexdigest()
+        mode = 'lines' if chunk_size is None else 'edges'
+        return os.path.join(cache_dir, f'{os.path.basename(file_path)}.{path_hash}.{mode}.{key.hexdigest()}')
+
+    @staticmethod
+    def load_log_cache(cache_path):
+        """Memory map the parsed columns of a cache entry.
+
+        Parameters
+        ----------
+        cache_path : str
+            Directory of the cache entry (see log_cache_path).
+
+        Returns
+        -------
+        columns : None|dict
+            None if the entry does not exist, otherwise the columns saved by save_log_cache.
+            The arrays are read-only numpy memory maps, so their pages are shared by every process
+            that opens the same entry.
+        """
+        meta_file = os.path.join(cache_path, 'meta.json')
+        if not os.path.isfile(meta_file):
+            return None
+        with open(meta_file) as f:
+            columns = json.load(f)
+        for name in NetworkLogReader.cache_columns:
+            columns[name] = np.load(os.path.join(cache_path, f'{name}.npy'), mmap_mode='r')
+        return columns
+
+    @staticmethod
+    def save_log_cache(cache_path, columns):
+        """Save parsed columns as a cache entry and remove older entries of the same log file.
+
+        Parameters
+        ----------
+        cache_path : str
+            Directory of the cache entry (see log_cache_path).
+        columns : dict
+            The cache_columns arrays and the line_count of the log file.
+
+        Notes
+        -------
+        1. The entry is written to a temporary directory and renamed into place,
+            so other processes never see a partially written entry.
+        2. Caching is best-effort: if the entry can't be written (e.g. the log is in a read-only directory,
+            or the disk is full) a message is printed and the log is read without a cache entry.
+        """
+        cache_dir, entry_name = os.path.split(cache_path)
+        tmp_path = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp.')
+            os.chmod(tmp_path, 0o755)
+            for name in NetworkLogReader.cache_columns:
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(columns[name]))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump({'line_count': int(columns['line_count'])}, f)
+        except OSError as e:
+            print(f'Parsed columns not cached, could not write to {cache_dir}: {e}')
+            if tmp_path is not None:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        try:
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            # Another process saved the same entry first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        # Entries of earlier versions of the log file can never be loaded again
+        log_name = entry_name.rsplit('.', 1)[0]  # file name, path hash and ingestion mode
+        for old_entry in os.listdir(cache_dir):
+            if old_entry != entry_name and old_entry.rsplit('.', 1)[0] == log_name:
+                shutil.rmtree(os.path.join(cache_dir, old_entry), ignore_errors=True)
+
+    @staticmethod
+    def read_log_chunks(file_name, chunk_size, engine='auto'):
+        """Stream a network failure log in chunks and sum the fails of each sender/receiver pair.
+
+        Parameters
+        ----------
+        file_name : str
+            Filename of network failure log, optionally compressed (see NetworkLogParser.open_log).
+        chunk_size : int
+            Approximate number of lines read from the failure log at a time.
+            Chunks are read as blocks of bytes, sized from the average line length at the start of the log.
+        engine : str
+            Parse engine, see NetworkLogParser.available_engines.  'auto' picks the fastest.
+
+        Returns
+        -------
+        edge_df : pandas.DataFrame
+            One row per unique (sender, receiver) pair with columns fails, sender, receiver.
+            Sender and receiver are uint32 ip addresses (see NetworkLogParser.ip_to_int).
+            The fails column is the sum of the fails of every line with that pair.
+        line_count : int
+            Number of lines read from the failure log.
+
+        Notes
+        -------
+        1. Each chunk is reduced to per-edge sums before it is kept, so memory use is bounded
+            by the number of distinct edges plus one chunk.
+        2. Chunk sums are queued and only folded into the running sums once the queue is as large
+            as the running sums.  This keeps the total folding work linear in the length of the log.
+        """
+        edge_fails = None
+        pending = []
+        pending_rows = 0
+        line_count = 0
+
+        for fails, sender, receiver in NetworkLogReader.iter_log_chunks(file_name, chunk_size, engine):
+            line_count += len(fails)
+            chunk_fails = NetworkLogReader.aggregate_edges(sender, receiver, fails)
+            pending.append(chunk_fails)
+            pending_rows += len(chunk_fails[0])
+
+            # Fold queued chunk sums into the running per-edge sums
+            running_rows = 0 if edge_fails is None else len(edge_fails[0])
+            if pending_rows >= running_rows:
+                edge_fails = NetworkLogReader.fold_edge_fails(edge_fails, pending)
+                pending = []
+                pending_rows = 0
+
+        edge_fails = NetworkLogReader.fold_edge_fails(edge_fails, pending)
+        if edge_fails is None:
+            edge_fails = NetworkLogParser.empty_columns()[1:] + (np.zeros(0, dtype=np.int64),)
+        sender, receiver, fails = edge_fails
+        edge_df = pd.DataFrame({'fails': fails, 'sender': sender, 'receiver': receiver})
+        return edge_df, line_count
+
+    @staticmethod
+    def iter_log_chunks(file_name, chunk_size, engine='auto'):
+        """Stream a network failure log as parsed chunks of about chunk_size lines.
+
+        Parameters
+        ----------
+        file_name : str
+            Filename of network failure log, optionally compressed (see NetworkLogParser.open_log).
+        chunk_size : int
+            Approximate number of lines per chunk.
+            Chunks are read as blocks of bytes, sized from the average line length at the start of the log.
+        engine : str
+            Parse engine, see NetworkLogParser.available_engines.  'auto' picks the fastest.
+
+        Yields
+        ------
+        fails : numpy.ndarray of int64
+            Number of fails of each line of the chunk.
+        sender, receiver : numpy.ndarray of uint32
+            ip address of the sender/receiver of each line of the chunk.
+        """
+        engine = NetworkLogParser.select_engine(engine, file_name)
+        with NetworkLogParser.open_log(file_name) as f:
+            sample = f.read(1 << 16)
+        line_bytes = len(sample) / max(1, sample.count(b'\n'))
+        block_bytes = max(1 << 12, int(chunk_size * line_bytes))
+
+        with NetworkLogParser.open_log(file_name) as f:
+            for block in NetworkLogParser.iter_blocks(f, block_bytes):
+                yield NetworkLogParser.parse_bytes(block, engine)
+
+    @staticmethod
+    def fold_edge_fails(edge_fails, pending):
+        """Sum queued per-edge fails into the running per-edge fails.
+
+        Parameters
+        ----------
+        edge_fails : None|tuple
+            Running (sender, receiver, fails) per-edge sums (see aggregate_edges), None if nothing has been folded yet.
+        pending : list of tuple
+            Chunk (sender, receiver, fails) per-edge sums.
+
+        Returns
+        -------
+        edge_fails : None|tuple
+            (sender, receiver, fails) with one entry per unique pair.
+        """
+        parts = pending if edge_fails is None else [edge_fails] + pending
+        if not parts:
+            return edge_fails
+        return NetworkLogReader.aggregate_edges(*(np.concatenate(column) for column in zip(*parts)))
+
+    def node_name(self, node_id):
+        """Display name (dotted quad ip address) of node_id."""
+        return NetworkLogParser.int_to_ip([self.node_addresses[node_id]])[0]
+
+    def node_names(self, node_ids=None):
+        """Display names (dotted quad ip addresses) of node_ids, or of every node if node_ids is None."""
+        addresses = self.node_addresses if node_ids is None else self.node_addresses[np.asarray(node_ids, dtype=int)]
+        return NetworkLogParser.int_to_ip(addresses)
+
+    @staticmethod
+    def sum_by_node(node_id, fails, num_nodes):
+        """Sum fails per node id.
+
+        Returns
+        -------
+        node_fails : numpy.ndarray of int64
+            Array of length num_nodes with the summed fails of each node id.
+        """
+        node_fails = np.zeros(num_nodes, dtype=np.int64)
+        np.add.at(node_fails, node_id, fails)
+        return node_fails
+
+    @staticmethod
+    def rank_nodes(node_lines, node_fails):
+        """Find the node ids that appear on at least one line, ordered descending by node_fails.
+
+        Parameters
+        ----------
+        node_lines : numpy.ndarray of int
+            Number of lines of each node id.
+        node_fails : numpy.ndarray of int
+            Number of fails of each node id.
+
+        Returns
+        -------
+        ranked_ids : numpy.ndarray of int
+            Node ids sorted descending by fails (ties are kept in ip address order).
+        """
+        present = np.flatnonzero(node_lines)
+        return present[np.argsort(-node_fails[present], kind='stable')]
+
     def print_top_fails(self, num_of_top=10):
         """Print the top servers with sender & receiver errors.
 
@@ -129,186 +937,355 @@ class NetworkLogReader:
         max_rows = pd.get_option('display.max_rows')
         pd.set_option('display.max_rows', None)
 
+        # Build the top rows of the pivot tables from the rankings (the pivot tables are None in lean mode)
+        # and show the ip address instead of the node id
+        top_receiver = pd.DataFrame({'fails': self.receiver_fails_count[:num_of_top]},
+                                    index=pd.Index(self.node_names(self.receiver_fails_id[:num_of_top]),
+                                                   name='receiver'))
+        top_sender = pd.DataFrame({'fails': self.sender_fails_count[:num_of_top]},
+                                  index=pd.Index(self.node_names(self.sender_fails_id[:num_of_top]), name='sender'))
+
         print('*'*100)
         print(f'The top {num_of_top} servers with receiving fails')
-        print(self.pivot_receiver[:num_of_top])
+        print(top_receiver)
         print(f'\nThe top {num_of_top} servers with sending fails')
-        print(self.pivot_sender[:num_of_top])
+        print(top_sender)
         print('*'*100)
 
         pd.set_option('display.max_rows', max_rows)
 
-    def initialize_network(self):
-        """Create networkx objects based on data structures created in read_log_file()
-           and create a composite structure dictionary to explore the network in detail.
+    def memory_report(self, print_report=True):
+        """Find the memory used by each attribute of the NetworkLogReader.
+
+        Parameters
+        ----------
+        print_report : bool
+            Set to true to print the report.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            Indexed by attribute name, sorted descending by bytes, with columns
+                bytes - memory held by the attribute (including everything it references).
+                mapped_bytes - bytes of memory mapped cache files referenced by the attribute.
 
         Notes
         -------
-        1. Primary purpose of this function is to create the self.composite object
-            which summaries all network information and who's values can be extracted
-            easily into a plot structure.
-        2. The self.composite is a dictionary with the following format:
-            composite[node][type]
-                type can be 'Send Errors', 'Receive Errors', 'Send+Receive Errors',
-                            'Send Edges',  'Receive Edges',  'Send+Receive Edges'
-            a) if the type ends in 'Errors', composite returns a single numeric with the error count.
-            b) if the type ends in 'Edges', composite returns a dictionary.
-            c) The edge dictionary is keyed off the other node in the connection
-                and its value is the weight between those two nodes.
-        3. Examples:
-            composite[a]['Send Errors']
-                = total number of send errors from "node a" to all other nodes.
-            composite[a]['Receive Edges']
-                = dictionary of connections between "node a"
-                  and all other nodes that "node a" receives errors from
-            composite[a][Send+Receive Edges][b]
-                = sum of send and receive errors between "node a" and "node b"
+        1. Objects referenced by several attributes (e.g. the node table columns referenced by the
+            fails dictionary views) are only counted for the first attribute that references them.
+        2. Memory mapped arrays are only read from disk as they are used and can be dropped from memory
+            by the operating system, so they are reported separately from bytes.
         """
-        # Select data to include in graph object.
-        # Data originally organized such that first node sends and the second receives.
-        # Switching the node order changes the context from send error to receive error.
-        # The original order analyses send failure, the switched order analyses receive failures for a given node.
-        # The send data will likely not have repeat lines, but the receive data likely will.
-        send_fails = [(x, y, int(z)) for x, y, z in self.raw_data]
-        receive_fails = [(y, x, int(z)) for x, y, z in self.raw_data]
-
-        self.send_graph = self.create_network_graph(send_fails)
-        self.receive_graph = self.create_network_graph(receive_fails)
-        # Composite combines the send & receive graphs into a single dictionary
-        self.composite_dict = self.create_composite_dict(self.send_graph, self.receive_graph)
-        print()
+        seen = set()
+        rows = {name: self.deep_sizeof(value, seen) for name, value in vars(self).items()}
+        report = pd.DataFrame.from_dict(rows, orient='index', columns=['bytes', 'mapped_bytes'])
+        report.index.name = 'attribute'
+        report = report.sort_values('bytes', ascending=False, kind='stable')
+
+        if print_report:
+            print('*'*100)
+            print(f'Memory used by NetworkLogReader attributes (MB)')
+            print((report / 1e6).round(3).to_string())
+            print(f'Total: {report["bytes"].sum() / 1e6:.3f} MB '
+                  f'plus {report["mapped_bytes"].sum() / 1e6:.3f} MB memory mapped')
+            print('*'*100)
+        return report
 
     @staticmethod
-    def create_network_graph(entries):
-        """Create Directional Networkx graph object from list of entries.
+    def deep_sizeof(obj, seen):
+        """Find the bytes used by obj and every object it references that is not in seen.
 
-        Networkx documentation at: https://networkx.github.io/documentation/stable/
+        Returns
+        -------
+        size : int
+            Bytes in memory.
+        mapped_size : int
+            Bytes of memory mapped numpy arrays.
+        """
+        if id(obj) in seen:
+            return 0, 0
+        seen.add(id(obj))
+
+        if isinstance(obj, np.ndarray):
+            if obj.base is None:
+                return sys.getsizeof(obj, 0), 0
+            # Views share the memory of the buffer they were created from, count it once
+            root = obj.base
+            while isinstance(root, np.ndarray) and root.base is not None:
+                root = root.base
+            size = sys.getsizeof(obj, 0)
+            if id(root) in seen:
+                return size, 0
+            seen.add(id(root))
+            if isinstance(root, mmap.mmap):
+                return size, len(root)
+            return size + sys.getsizeof(root, 0), 0
+        if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+            memory = obj.memory_usage(deep=True)
+            return int(memory.sum() if isinstance(memory, pd.Series) else memory), 0
+        if isinstance(obj, (bytes, str, int, float, range)) or obj is None:
+            return sys.getsizeof(obj, 0), 0
+
+        size, mapped_size = sys.getsizeof(obj, 0), 0
+        if isinstance(obj, dict):
+            referenced = [*obj.keys(), *obj.values()]
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            referenced = list(obj)
+        else:
+            referenced = list(getattr(obj, '__dict__', {}).values())
+            for cls in type(obj).__mro__:
+                referenced += [getattr(obj, name) for name in getattr(cls, '__slots__', ())
+                               if isinstance(name, str) and hasattr(obj, name)]
+        for item in referenced:
+            item_size, item_mapped_size = NetworkLogReader.deep_sizeof(item, seen)
+            size += item_size
+            mapped_size += item_mapped_size
+        return size, mapped_size
+
+    def start_follow(self, file_name=None):
+        """Start following a log file that is still being written, see follow_log_file.
 
         Parameters
         ----------
-        entries : list of 3 member tuples
-             Failure data in (sender node, receiver node, number of connections) format.
-             If multiple lines have the same sender & receiver, the weighting from each line will be summed.
+        file_name : None|str
+            Log file to follow.  None follows self.file_name, which must be a single file.
+
+        Notes
+        -------
+        1. Following starts at the current end of the file, the lines before it are assumed to
+            have been read already (for example by read_log_file).
+        """
+        if file_name is None:
+            file_name = self.file_name
+        if not (isinstance(file_name, str) and os.path.isfile(file_name)):
+            raise Exception(f'Only a single log file can be followed: {file_name}')
+
+        handle = open(file_name, 'rb')
+        handle.seek(0, os.SEEK_END)
+        self.follow_state = {'file_name': file_name,
+                             'handle': handle,
+                             'inode': os.fstat(handle.fileno()).st_ino,
+                             'remainder': b''}    # partial line at the end of the file
+
+    def stop_follow(self):
+        """Stop following the log file and close it."""
+        if getattr(self, 'follow_state', None) is not None:
+            self.follow_state['handle'].close()
+            self.follow_state = None
+
+    def read_appended_lines(self):
+        """Read the complete lines appended to the followed log file since the last call.
 
         Returns
         -------
-        d_graph : networkx.DiGraph
-             Directional graph created from entries.
+        data : bytes
+            Newline terminated lines, a partial last line is kept until it is completed.
 
         Notes
         -------
-        1. networkx has 3 graph objects of interest for this application.
-            a) Regular (unspecified):  direction of edge is not important
-                adding (A, B) twice will overwrite the first (A, B) entry.
-                adding edge(B, A) will overwrite edge(A, B) entry as well since direction is not important.
-            b) Directed graphs: direction is import
-                connection (A, B) and (B, A) tracked independently.
-                adding (A, B) twice will overwrite the first (A, B) entry.
-            c) MultiDigraphs: multiple entries for the same edge.
-                repeated entries of (A, B) will be tracked independently
-        2.  Strategy is to start with a MultiDiGraph in case node parings appear on multiple lines.
-                If weights are found on multiple lines, they will be summed for a total weight
-                and saved as a directed graph.
-        3. networkx determines the order of nodes in output, which may not be in alphabetical/expected order.
-        """
-        # Create graph that saves directional information and
-        # allows for multiple entries for the same node paring
-        mdg = nx.MultiDiGraph()
-        mdg.add_weighted_edges_from(entries)
-
-        # Create directional graph from multiline graph.
-        # Only one entry for each node paring is created.
-        # If multiple entries had the same node signature, the weights will be summed into one entry.
-        d_graph = nx.DiGraph()
-        for send_node, receive_nodes in mdg.adjacency():
-            # print(send_node, receive_nodes)
-            for receive_node, entries in receive_nodes.items():
-                # print("   ", receive_node, entries)
-                sum_weights = sum([d['weight'] for d in entries.values()])
-                d_graph.add_edge(send_node, receive_node, weight=sum_weights)
-        return d_graph
-
-    def create_composite_dict(self, send, receive):
-        """Combine sending and receiving graph object information into single dictionary
-            to facilitate plotting routines.
-
-        Parameters
-        ----------
-        send : networkx.DiGraph
-            network graph based on sending data.
-        receive : networkx.DiGraph
-            network graph based on receiving data.
+        1. logrotate-style rotation is detected when the file name refers to a new file (create mode)
+            or when the file is shorter than what has been read (copytruncate mode).
+            The rest of the old file is read before continuing with the new file from its start.
+        """
+        state = self.follow_state
+        data = [state['remainder'], state['handle'].read()]
+
+        try:
+            stat = os.stat(state['file_name'])
+        except FileNotFoundError:
+            stat = None     # Rotated, but the new log file has not been created yet
+
+        if stat is not None and stat.st_ino != state['inode']:
+            # The old file has been read to its end above, a missing final newline ends its last line
+            data.append(b'\n')
+            state['handle'].close()
+            state['handle'] = open(state['file_name'], 'rb')
+            state['inode'] = os.fstat(state['handle'].fileno()).st_ino
+            data.append(state['handle'].read())
+        elif stat is not None and stat.st_size < state['handle'].tell():
+            # Truncated in place, the lines written since the truncation start at the beginning
+            data.append(b'\n')
+            state['handle'].seek(0)
+            data.append(state['handle'].read())
+
+        data, newline, state['remainder'] = b''.join(data).rpartition(b'\n')
+        return data + newline
+
+    def parse_log_lines(self, data):
+        """Parse lines of a log file that are held in memory.
+
+        Parameters
+        ----------
+        data : bytes
+            Lines in 'fails sender receiver' format.  Blank and header lines are skipped.
 
         Returns
         -------
-        composite : dict
-            Dictionary to facilitate inspection and plotting of network.
+        fails : numpy.ndarray of int64
+        sender, receiver : numpy.ndarray of uint32
+            ip addresses, see NetworkLogParser.ip_to_int.
         """
-        # dictionary for composite network information
-        composite = {key: {} for key in self.unique_nodes}
+        # A rotated log can start with a header line anywhere in data
+        data = NetworkLogParser.remove_text_lines(data)
+        engine = NetworkLogParser.select_engine(getattr(self, 'parse_engine', 'auto'), self.follow_state['file_name'])
+        return NetworkLogParser.parse_bytes(data, engine)
 
-        # Store network adjacency information for sending & receiving node errors
-        self.append_adjacency(composite, send, key_name='Send Edges')
-        self.append_adjacency(composite, receive, key_name='Receive Edges')
+    def poll_log_file(self):
+        """Read the lines appended to the followed log file and apply them to the network.
 
-        # Store the summed errors for each node
-        for node in self.unique_nodes:
-            send_error = self.sender_fails_dict.get(node, 0)
-            receive_error = self.receiver_fails_dict.get(node, 0)
-            composite[node]['Send Errors'] = send_error
-            composite[node]['Receive Errors'] = receive_error
-            composite[node]['Send+Receive Errors'] = send_error + receive_error
-            composite[node]['Send+Receive Edges'] = self.add_dicts(composite[node]['Send Edges'],
-                                                                   composite[node]['Receive Edges'])
-        # pp.pprint(composite)
-        return composite
+        Returns
+        -------
+        changed_nodes : numpy.ndarray of int
+            Node ids whose edges changed.
+        rebuilt : bool
+            True if new nodes were found and every node id, position and plot data entry was recalculated.
+        """
+        if getattr(self, 'follow_state', None) is None:
+            self.start_follow()
+        fails, sender, receiver = self.parse_log_lines(self.read_appended_lines())
+        return self.apply_log_delta(fails, sender, receiver)
 
-    @staticmethod
-    def append_adjacency(composite, net_graph, key_name):
-        """Extract adjacency information from a networkx graph object and add it to a composite dictionary.
+    def follow_log_file(self, poll_interval=2.0, max_polls=None, callback=None):
+        """Follow a log file that is still being written and apply the appended lines as they arrive.
 
         Parameters
         ----------
-        composite : dict
-            Dictionary to append information from net_graph.
-        net_graph : networkx.DiGraph
-            network graph obj that contains either sending or receiving data.
-        key_name : str
-            Key used to append data to the composite dict.
-        """
-        for adj in net_graph.adjacency():
-            (node_a, connections) = adj
-            composite[node_a][key_name] = {}
-            for node_b, w in connections.items():
-                composite[node_a][key_name][node_b] = w['weight']
+        poll_interval : float
+            Seconds between checks for appended lines.
+        max_polls : None|int
+            Number of checks before returning, None follows the log forever.
+        callback : None|callable
+            Called as callback(self, changed_nodes, rebuilt) after appended lines were applied,
+            see poll_log_file.
 
-    @staticmethod
-    def add_dicts(d1, d2):
-        """Add contents of two dictionaries together.
-           If both dictionaries have the same key, sum the associated value from both dictionaries.
+        Notes
+        -------
+        1. This blocks, run it in a thread to keep a notebook responsive
+            (see NetworkLogPlotter.follow_log).
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            changed_nodes, rebuilt = self.poll_log_file()
+            if callback is not None and (len(changed_nodes) or rebuilt):
+                callback(self, changed_nodes, rebuilt)
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(poll_interval)
+
+    def apply_log_delta(self, fails, sender, receiver):
+        """Apply new log lines to the fails, network graph and plot data.
 
         Parameters
         ----------
-        d1 : dict
-        d2 : dict
+        fails : numpy.ndarray
+            Number of fails of each new line.
+        sender, receiver : numpy.ndarray of uint32
+            ip address of the sender/receiver of each new line.
 
         Returns
         -------
-        d3 : dict
-            Combined dictionary with summed contents of d1 and d2.
+        changed_nodes : numpy.ndarray of int
+            Node ids whose edges changed.
+        rebuilt : bool
+            True if new nodes were found and every node id, position and plot data entry was recalculated.
+
+        Notes
+        -------
+        1. Node ids are positions in the sorted node table, so a new node shifts the ids of every node
+            after it.  New nodes therefore re-intern the node table and recalculate the network, layout
+            and plot data from the parsed columns (the log file is not read again).
+        2. Otherwise only the per-node sums and rankings, the network graph,
+            and the plot data entries of the nodes whose edges changed are updated.
+            Other plot data entries only have the hover text and color of the changed nodes updated.
+        """
+        if len(fails) == 0:
+            return np.zeros(0, dtype=int), False
+
+        # New nodes change the node ids, recalculate everything from the parsed columns
+        if not np.all(np.isin(np.concatenate([sender, receiver]), self.node_addresses)):
+            columns = self.intern_columns(np.concatenate([self.fails, fails]),
+                                          np.concatenate([self.sender, sender]),
+                                          np.concatenate([self.receiver, receiver]),
+                                          self.line_count + len(fails))
+            self.line_count = columns['line_count']
+            self.process_columns(columns['fails'], columns['sender_id'], columns['receiver_id'],
+                                 columns['node_addresses'])
+            self.initialize_network()
+            self.layout_network(**self.layout_args)
+            self.calc_plot_data()
+            return np.asarray(self.unique_nodes), True
+
+        sender_id = np.searchsorted(self.node_addresses, sender).astype(np.uint32)
+        receiver_id = np.searchsorted(self.node_addresses, receiver).astype(np.uint32)
+
+        # Append the new lines to the edge table
+        self.edge_table.append(sender_id, receiver_id, fails)
+        self.line_count += len(fails)
+
+        # Update per-node sums and rankings (the fails dictionaries are views of the node table)
+        self.node_table.add_counts('send_fails', sender_id, fails)
+        self.node_table.add_counts('receive_fails', receiver_id, fails)
+        self.node_table.add_counts('send_lines', sender_id, np.ones(len(fails), dtype=np.int64))
+        self.node_table.add_counts('receive_lines', receiver_id, np.ones(len(fails), dtype=np.int64))
+        self.rank_fails()
+
+        changed_nodes = np.unique(np.concatenate([sender_id, receiver_id]))
+
+        # Add the new lines to the sparse network graph
+        self.graph.add_edges(sender_id, receiver_id, fails)
+
+        self.update_plot_data(changed_nodes)
+        return changed_nodes, False
+
+    def update_plot_data(self, changed_nodes):
+        """Update self.plot_data after the edges of changed_nodes changed.
+
+        Parameters
+        ----------
+        changed_nodes : array-like of int
+            Node ids whose edges (and therefore fails) changed.
+
+        Notes
+        -------
+        1. The shared hover text and colors of changed_nodes are updated in place.
+        2. Cached entries of changed_nodes are dropped so they are recalculated when requested.
+            Every other entry keeps its edges and hover text overlay: a new line only changes
+            the connection between its sender and receiver, which are both in changed_nodes.
+        """
+        changed_nodes = np.asarray(changed_nodes, dtype=np.intp)
+        self.plot_data.invalidate(changed_nodes.tolist())
+
+        node_text = self.plot_data['Node Text']
+        for node, text in zip(changed_nodes.tolist(), self.calc_node_text(changed_nodes)):
+            node_text[node] = text
+        for edge_type, node_color in self.plot_data['Node Color'].items():
+            node_color[changed_nodes] = self.node_fails(edge_type)[changed_nodes]
+
+    def initialize_network(self):
+        """Create the sparse network graph (self.graph) from the data structures created in read_log_file()
+           to explore the network in detail.
 
         Notes
         -------
+        1. self.graph is a NetworkLogGraph that summarizes all network information and whose values
+            can be extracted easily into a plot structure.  Lines with the same sender and receiver
+            are summed when it is created.
+        2. Edges and weights are looked up by node id (see self.node_addresses) and edge type:
+            self.graph.edges(a, 'Send')
+                = node ids that "node a" sends errors to, and the number of errors sent to each.
+            self.graph.edges(a, 'Receive')
+                = node ids that "node a" receives errors from, and the number of errors received from each.
+            self.graph.weight(a, b, 'Send+Receive')
+                = sum of send and receive errors between "node a" and "node b"
+            self.graph.send_fails[a], self.graph.receive_fails[a]
+                = total number of send/receive errors of "node a".
+        3. networkx graphs are only created on request, e.g. self.graph.to_networkx('Send').
         """
-        d3 = d1.copy()
-        for k, v in d2.items():
-            if k in d3:
-                d3[k] = d3[k] + v
-            else:
-                d3[k] = v
-        return d3
+        self.graph = NetworkLogGraph(self.sender_id, self.receiver_id, self.fails, len(self.node_addresses))
+        print()
 
-    def layout_network(self, order_by_ip=True, rectangular_grid=False):
+    def layout_network(self, order_by_ip=True, rectangular_grid=False, seed=None, layout=None, iterations=None,
+                       time_limit=None, layout_store=None):
         """Determine node locations/coordinates to allow visualization/plotting of the network.
 
         Parameters
@@ -320,6 +1297,33 @@ class NetworkLogReader:
             Set to true for a grid placement that is roughly rectangular.
              It will not be exactly rectangular because noise is added to avoid edge line overlap.
 
+        seed : None|int
+            Seed of the rectangular grid or subnet layout noise, None to use self.layout_seed.
+
+        layout : None|str
+            None to select the layout with rectangular_grid, or one of:
+                'square' - the rectangular grid (see square_layout).
+                'spiral' - networkx spiral_layout.
+                'subnet' - /16 blocks, /24 tiles and hosts by ip address (see NetworkLogLayouts.subnet_layout),
+                           a linear time map of where failures concentrate for networks of any size.
+                'spectral' - sparse eigensolver layout of the 'Send+Receive' graph
+                             (see NetworkLogLayouts.spectral_layout).
+                'force' - force-directed layout of the 'Send+Receive' graph started from the spectral layout
+                          (see NetworkLogLayouts.force_layout).
+
+        iterations : None|int
+            Iteration budget of the 'spectral' and 'force' layouts, None for their defaults.
+
+        time_limit : None|float
+            Seconds the 'spectral' or 'force' layout may take, None for no limit.
+            The 'force' layout gives half of it to its spectral starting layout.
+
+        layout_store : None|str|NetworkLogLayoutStore
+            Store (or .npz file name of a store) of node coordinates keyed by ip address, e.g. shared by the
+            logs of every day.  Nodes found in the store keep their stored coordinates and only new nodes
+            are placed, next to their ip address or graph neighbours (see NetworkLogLayouts.place_new_nodes).
+            The layout is only computed if none of the nodes are stored.  The store is updated and saved afterwards.
+
         Notes
         -------
         1) Various networkx options are listed in layout_types below.  Pick any compatible layout.
@@ -331,30 +1335,79 @@ class NetworkLogReader:
 
         # networkx routines to find node layout
         # Each returns a dictionary of positions keyed by node.  The positions are [x, y].
-        layout_types = [nx.bipartite_layout, nx.circular_layout, nx.kamada_kawai_layout, nx.planar_layout,
-                        nx.random_layout, nx.rescale_layout, nx.rescale_layout_dict, nx.shell_layout,
-                        nx.spring_layout, nx.spectral_layout, nx.spiral_layout, nx.multipartite_layout]
-
-        if rectangular_grid:
+        # layout_types = [nx.bipartite_layout, nx.circular_layout, nx.kamada_kawai_layout, nx.planar_layout,
+        #                 nx.random_layout, nx.rescale_layout, nx.rescale_layout_dict, nx.shell_layout,
+        #                 nx.spring_layout, nx.spectral_layout, nx.spiral_layout, nx.multipartite_layout]
+
+        # Remember the layout so it can be repeated when the network changes (see apply_log_delta)
+        self.layout_args = {'order_by_ip': order_by_ip, 'rectangular_grid': rectangular_grid, 'seed': seed,
+                            'layout': layout, 'iterations': iterations, 'time_limit': time_limit,
+                            'layout_store': layout_store}
+        if layout is None:
+            layout = 'square' if rectangular_grid else 'spiral'
+        seed = self.layout_seed if seed is None else seed
+
+        if layout_store is not None:
+            if not isinstance(layout_store, NetworkLogLayoutStore):
+                layout_store = NetworkLogLayoutStore(layout_store)
+            stored_xy, known = layout_store.lookup(self.node_addresses)
+        else:
+            known = np.zeros(0, dtype=bool)
+
+        if known.any():
+            # Reuse the stored coordinates and only place the new nodes,
+            # next to their ip address neighbours if the layout is ordered by ip address
+            print(f'{int(known.sum())} of {len(known)} node locations found in {layout_store.file_name}')
+            near = 'address' if layout in ('square', 'subnet') else 'neighbours'
+            positions = NetworkLogLayouts.place_new_nodes(self.graph.matrix('Send+Receive'), stored_xy, known,
+                                                          near, seed=seed)
+        elif layout == 'square':
             # Custom square layout with noise created to best spread network sorted by IP address
-            self.node_positions = self.square_layout(self.send_graph, noise=0.15)
+            # It returns an array of coordinates in node id (ip address) order
+            positions = self.square_layout(len(self.unique_nodes), noise=0.15, seed=seed)
+        elif layout == 'subnet':
+            # Hierarchical layout by ip address, also an array in node id order
+            positions = NetworkLogLayouts.subnet_layout(self.node_addresses, seed=seed)
+        elif layout == 'spectral':
+            positions = NetworkLogLayouts.spectral_layout(self.graph.matrix('Send+Receive'), iterations, time_limit,
+                                                          seed=seed)
+        elif layout == 'force':
+            # Start from the spectral layout so the force layout only has to refine it
+            half_time = None if time_limit is None else time_limit / 2
+            init = NetworkLogLayouts.spectral_layout(self.graph.matrix('Send+Receive'), time_limit=half_time,
+                                                     seed=seed)
+            positions = NetworkLogLayouts.force_layout(self.graph.matrix('Send+Receive'), init, iterations, half_time,
+                                                       seed=seed)
+        elif layout == 'spiral':
+            # Choose any of the layout_types for line below, networkx layouts accept a list of nodes
+            if nx is None:
+                raise Exception('networkx is required unless rectangular_grid is True')
+            positions = nx.spiral_layout(self.unique_nodes)
+
+            # Sort node locations by ip address if the user requests.
+            # It is not clear the order of the nx layouts since they are dictionaries that can't be sorted
+            # Re-ordering may/may not improve plot readability, but it won't corrupt the node coordinates
+            if order_by_ip:
+                # Extract nodes from position dictionary then sort them in a list
+                # Node ids are interned in ip address order, so an integer sort orders them by ip address
+                tmp = {}
+                node = (i for i in sorted(positions.keys()))
+                for k, v in positions.items():
+                    tmp[next(node)] = v
+                positions = tmp
         else:
-            # Choose any of the layout_types for line below
-            self.node_positions = nx.spiral_layout(self.send_graph)
-
-        # Sort node locations by ip address if the user requests.
-        # It is not clear the order of the nx layouts since they are dictionaries that can't be sorted
-        # Re-ordering may/may not improve plot readability, but it won't corrupt the node coordinates
-        if order_by_ip:
-            # Extract nodes from position dictionary then sort them in a list
-            tmp = {}
-            node = (i for i in sorted(self.node_positions.keys(), key=ipaddress.IPv4Address))
-            for k, v in self.node_positions.items():
-                tmp[next(node)] = v
-            self.node_positions = tmp
+            raise Exception(f'Unknown layout: {layout}')
+
+        # Keep the coordinates in the node table, self.node_positions is a dictionary view of them
+        self.node_table.set_positions(positions)
+        self.node_positions = NodePositionView(self.node_table)
+
+        if layout_store is not None and not known.all():
+            layout_store.update(self.node_addresses, self.node_table.xy)
+            layout_store.save()
 
     @staticmethod
-    def square_layout(net_graph, noise=0.17):
+    def square_layout(num_nodes, noise=0.17, seed=0):
         """Custom node layout routine to arrange nodes in a square-ish format to facilitate grouping
         nodes in order by ip address.
 
@@ -366,119 +1419,177 @@ class NetworkLogReader:
 
         Parameters
         ----------
-        net_graph : nx.DiGraph
-            networkx graph object (used to determine node names & weights).
+        num_nodes : int
+            Number of nodes to place.
 
         noise : float
             Fraction of random noise added to each node location to avoid having a perfectly straight grid.
 
+        seed : None|int
+            Seed of the numpy random generator of the noise, the same seed gives the same layout.
+            None for a different layout each time.
+
         Returns
         -------
-        return_dict : dic
-            Dictionary keyed off node name with [x, y] values in same format as networkx layout return types.
-        """
-        def next_node(node_count):
-            """Nested generator function to determine node coordinates of the next
-                node using a square layout with random noise added
-
-            Parameters
-            ----------
-            node_count : int
-                Total number of nodes to visualize in a square-ish grid
-
-            Returns
-            -------
-            coord : 2 member list of float [x, y]
-                x,y coordinates of the next location in the grid spacing.
-            """
-            # Assume layout is square-ish, ceil (rounding up) will ensure max capacity
-            nodes_per_axis = ceil(node_count ** 0.5)
-            max_nodes = nodes_per_axis ** 2
-            spacing = 1/nodes_per_axis
-
-            # Loop through coordinate structure and add a little noise
-            for y in (j*spacing for j in range(nodes_per_axis)):
-                for x in (i*spacing for i in range(nodes_per_axis)):
-                    noise1 = random.uniform(-spacing, spacing) * noise
-                    noise2 = random.uniform(-spacing, spacing) * noise
-                    coord = [x+noise1, y+noise2]
-                    yield coord
-
-        # Create location dictionary
-        return_dict = {}
-
-        # Sort node names as if they were IP addresses
-        sorted_nodes = sorted(net_graph.nodes.keys(), key=ipaddress.IPv4Address)
-        nn = next_node(len(sorted_nodes))
-
-        for n in sorted_nodes:
-            return_dict[n] = next(nn)
-        return return_dict
+        xy : numpy.ndarray of float
+            (num_nodes, 2) array with the [x, y] coordinates of node ids 0 .. num_nodes-1.
+            Node ids are interned in ip address order, so the grid is filled row by row in ip address order.
+        """
+        # Assume layout is square-ish, ceil (rounding up) will ensure max capacity
+        nodes_per_axis = max(ceil(num_nodes ** 0.5), 1)
+        spacing = 1/nodes_per_axis
+
+        # Grid location of each node plus a little noise
+        grid = np.arange(num_nodes)
+        xy = np.column_stack([grid % nodes_per_axis, grid // nodes_per_axis]) * spacing
+        rng = np.random.default_rng(seed)
+        xy += rng.uniform(-spacing, spacing, size=(num_nodes, 2)) * noise
+        return xy
 
     def calc_plot_data(self):
         """Create easy-to-plot structures for the nodes, hover information, connections, and weights
-            based on self.composite_graph, self.node_positions, and self.unique_nodes attributes.
+            based on self.graph, self.node_positions, and self.unique_nodes attributes.
 
         Notes
         -------
         1. Primary purpose of this function is to create the self.plot_data object
             which summaries network information in an easily plotted structure.
-        2. The self.plot_data is a dictionary with the following attributes:
+        2. The self.plot_data is a dictionary-like NetworkLogPlotData with the following attributes:
+             plot_data['Node Ids']
              plot_data['Node Names']
              plot_data['Node Coordinates']
              plot_data[n][edge_type][data_type]
 
             where:
-                n: is the node of interest
+                n: is the node id of interest
                 edge_type can be: 'Send', 'Receive', 'Send+Receive'
                 data_type can be:
-                    'edge_coordinates', 'line_data', 'shape_data',
-                    'weights', 'node_text', 'node_color'
+                    'edge_coordinates', 'line_data', 'trace_data',
+                    'weights', 'node_color', 'text_overlay'
+            Plotly layout shapes of the edges are only made when needed, with lines_to_shapes(line_data).
+        3. Hover text and colors are mostly the same for every node of interest, so they are shared:
+             plot_data['Node Text'] - hover text of each node (list of str).
+             plot_data['Node Color'][edge_type] - color value of each node (numpy array).
+            plot_data[n][edge_type]['node_color'] is the shared color array and
+            plot_data[n][edge_type]['text_overlay'] only holds the text added to the neighbours of n,
+            use node_marker(n, edge_type) for the complete hover text.
         """
-        # store all plot data into a dictionary
-        self.plot_data = {}
+        # store all plot data into a dictionary that calculates the data of each node when first requested
+        # and keeps the data of the plot_cache_size most recently requested nodes
+        self.plot_data = NetworkLogPlotData(self.unique_nodes, self.calc_node_plot_data, self.plot_cache_size)
 
-        # store the node names as a tuple that can't be re-ordered
-        self.plot_data['Node Names'] = tuple(self.unique_nodes)
+        # store the node ids and their display names as tuples that can't be re-ordered
+        self.plot_data['Node Ids'] = tuple(self.unique_nodes)
+        self.plot_data['Node Names'] = tuple(self.node_names(self.unique_nodes))
 
         # store node coordinates as a tuple that can't be re-ordered
-        temp_x = []
-        temp_y = []
-        for n in self.unique_nodes:
-            temp_x.append(self.node_positions[n][0])
-            temp_y.append(self.node_positions[n][1])
-        self.plot_data['Node Coordinates'] = tuple([tuple(temp_x), tuple(temp_y)])
-
-        # Plot data to consider for visualization
-        edge_types = ['Send', 'Receive', 'Send+Receive']
-
-        for n in self.unique_nodes:
-            # print(n)
-            self.plot_data[n] = {}
-            for edge_type in edge_types:
-                self.plot_data[n][edge_type]={}
-                # print(edge_type)
-                edge_coordinates, line_data, weights = self.find_edge_info(n, edge_type)
-                self.plot_data[n][edge_type]['edge_coordinates'] = edge_coordinates
-                self.plot_data[n][edge_type]['line_data'] = line_data
-                self.plot_data[n][edge_type]['shape_data'] = self.lines_to_shapes(line_data)
-                self.plot_data[n][edge_type]['weights'] = weights
-
-                node_text, node_color = self.find_marker_text(n, edge_type)
-                self.plot_data[n][edge_type]['node_text'] = node_text
-                self.plot_data[n][edge_type]['node_color'] = node_color
-
-    def find_marker_text(self, node_a, edge_type):
-        """Calculate marker hover text for plotting purposes.
+        xy = self.node_table.xy[np.asarray(self.unique_nodes)].astype(float)
+        self.plot_data['Node Coordinates'] = (tuple(xy[:, 0].tolist()), tuple(xy[:, 1].tolist()))
 
-        Only called by calc_plot_data.
+        # store the hover text and colors shared by every node of interest
+        self.plot_data['Node Text'] = self.calc_node_text(self.unique_nodes)
+        self.plot_data['Node Color'] = {edge_type: self.node_fails(edge_type).astype(np.int64)
+                                        for edge_type in self.edge_types}
+
+    def calc_node_plot_data(self, n):
+        """Create the plot data of a single node of interest, see calc_plot_data.
 
         Parameters
         ----------
-        node_a : str
-            The node of interest (the one selected in the figure).
+        n : int
+            The node id of interest.
+
+        Returns
+        -------
+        node_plot_data : dict
+            node_plot_data[edge_type][data_type] as described in calc_plot_data.
+        """
+        node_plot_data = {}
+        # The hover text overlay only depends on the node of interest, share it between edge types
+        text_overlay = self.find_text_overlay(n)
+        for edge_type in self.edge_types:
+            node_plot_data[edge_type] = {}
+            # print(edge_type)
+            edge_coordinates, line_data, weights = self.find_edge_info(n, edge_type)
+            node_plot_data[edge_type]['edge_coordinates'] = edge_coordinates
+            node_plot_data[edge_type]['line_data'] = line_data
+            node_plot_data[edge_type]['trace_data'] = self.lines_to_traces(line_data)
+            node_plot_data[edge_type]['weights'] = weights
+
+            node_plot_data[edge_type]['node_color'] = self.plot_data['Node Color'][edge_type]
+            node_plot_data[edge_type]['text_overlay'] = text_overlay
+        return node_plot_data
+
+    def node_fails(self, edge_type):
+        """Fails of each node id used to color the nodes for edge_type (numpy array)."""
+        if edge_type == 'Send':
+            return self.node_send_fails
+        elif edge_type == 'Receive':
+            return self.node_receive_fails
+        elif edge_type == 'Send+Receive':
+            return self.node_send_fails.astype(np.int64) + self.node_receive_fails
+        else:
+            raise Exception(f'Unknown edge_type: {edge_type}')
+
+    def calc_node_text(self, nodes):
+        """Calculate the hover text of nodes that is the same for every node of interest.
+
+        Parameters
+        ----------
+        nodes : array-like of int
+            Node ids to annotate.
+
+        Returns
+        -------
+        node_text : list of str
+            Hover text of each node with its total, send and receive fails.
+        """
+        nodes = np.asarray(nodes, dtype=np.intp)
+        names = self.node_names(nodes)
+        send = self.node_send_fails[nodes].tolist()
+        receive = self.node_receive_fails[nodes].tolist()
+        return [f"{name} <-> All Nodes: Total={s + r} Send={s} Receive={r}"
+                for name, s, r in zip(names, send, receive)]
+
+    def find_text_overlay(self, node_a):
+        """Calculate the hover text added to the nodes connected to the node of interest.
+
+        Only called by calc_node_plot_data.
+
+        Parameters
+        ----------
+        node_a : int
+            The node id of interest (the one selected in the figure).
+
+        Returns
+        -------
+        text_overlay : tuple of (numpy.ndarray of int, list of str)
+            Node ids with at least one failure to or from node_a, and the text appended to their hover text
+                showing the fails between these two individual nodes.
+        """
+        nodes, my_total = self.graph.edges(node_a, 'Send+Receive')
+        # Fails node sent to node_a are fails node_a received from node, and the other way around
+        my_send = self.graph.edge_weights(node_a, nodes, 'Receive')
+        my_receive = self.graph.edge_weights(node_a, nodes, 'Send')
+        node_a_name = self.node_name(node_a)
+        text = [f'<br>{name} <-> {node_a_name}: Total={t}, Send={s}, Receive={r}'
+                for name, t, s, r in zip(self.node_names(nodes), my_total.tolist(), my_send.tolist(),
+                                         my_receive.tolist())]
+        return nodes, text
+
+    def node_marker(self, node_a, edge_type, overlay_only=False):
+        """Compose the marker hover text and colors of every node for the node of interest.
+
+        Parameters
+        ----------
+        node_a : int
+            The node id of interest (the one selected in the figure).
         edge_type : ['Send', 'Receive', 'Send+Receive']
             Type of connection to analyse.
+        overlay_only : bool
+            Set to true to leave out the shared hover text, so node_text only holds the connection
+            information of the nodes connected to node_a (and '' for other nodes).
+            Used with node_customdata when the hover text is formatted by plotly.
 
         Returns
         -------
@@ -488,56 +1599,34 @@ class NetworkLogReader:
             For nodes that have a connection with the node of interest, the caption will
                 be appended with that individual connection information.
 
-        node_color : list of numeric
-            A value for each node is created with the same numeric type as the weight in the original
-                error log file (likely integer) with length of self.plot_data['Node Names'].
+        node_color : numpy.ndarray of int
+            A value for each node with the number of fails of edge_type of that node,
+                with length of self.plot_data['Node Names'].
             These values will be used by plotly to determine the color for each node and the
                 range of the associated colorbar.
-
-        Notes
-        -------
-        1) Plot data is extracted from self.composite_graph.
-        2) Node coordinates are determined by self.node_positions.
         """
+        node_plot_data = self.plot_data[node_a][edge_type]
+        node_text = [''] * len(self.unique_nodes) if overlay_only else list(self.plot_data['Node Text'])
+        for node, text in zip(*node_plot_data['text_overlay']):
+            node_text[node] += text
+        return node_text, node_plot_data['node_color']
 
-        # Color node points and determine hover text
-        node_color = []
-        node_text = []
-        for node in self.plot_data['Node Names']:
-            node_send_fails = self.sender_fails_dict.get(node, 0)
-            node_receive_fails = self.receiver_fails_dict.get(node, 0)
-            node_total_fails = self.total_fails_dict.get(node, 0)
+    def node_customdata(self):
+        """Per-node values formatted into hover text by plotly, see NetworkLogPlotter.hover_template.
 
-            # Have plot color be proportional to desired type of fails count for the node
-            if edge_type == 'Send':
-                node_color.append(node_send_fails)
-            elif edge_type == 'Receive':
-                node_color.append(node_receive_fails)
-            elif edge_type == 'Send+Receive':
-                node_color.append(node_total_fails)
-            else:
-                raise Exception(f'Unknown edge_type: {edge_type}')
-
-            # Find the hover text for each node
-            nt = f"{node} <-> All Nodes: Total={node_total_fails} " \
-                 f"Send={node_send_fails} " \
-                 f"Receive={node_receive_fails}"
-
-            # Add an additional annotation to the node if connected to the node of interest
-            # Showing the fails between these two individual nodes
-            my_send = my_receive = my_total = 0
-
-            my_send = self.composite_dict[node]['Send Edges'].get(node_a, 0)
-            my_receive = self.composite_dict[node]['Receive Edges'].get(node_a, 0)
-            my_total = self.composite_dict[node]['Send+Receive Edges'].get(node_a, 0)
-
-            # Only append information if there is at least one failure to the node of interest.
-            if my_total > 0:
-                nt += f'<br>{node} <-> {node_a}: Total={my_total}, Send={my_send}, Receive={my_receive}'
-
-            node_text.append(nt)
-
-        return node_text, node_color
+        Returns
+        -------
+        customdata : numpy.ndarray of object
+            One row per node id with columns node name, send fails, receive fails and total fails.
+        """
+        send = self.node_send_fails.astype(np.int64)
+        receive = self.node_receive_fails.astype(np.int64)
+        customdata = np.empty((len(self.unique_nodes), 4), dtype=object)
+        customdata[:, 0] = self.plot_data['Node Names']
+        customdata[:, 1] = send
+        customdata[:, 2] = receive
+        customdata[:, 3] = send + receive
+        return customdata
 
     def find_edge_info(self, node_a, edge_type):
         """Calculate edge coordinates and weights for plotting purposes.
@@ -546,67 +1635,76 @@ class NetworkLogReader:
 
         Parameters
         ----------
-        node_a : str
-            The node of interest (the one selected in the figure).
+        node_a : int
+            The node id of interest (the one selected in the figure).
         edge_type : ['Send', 'Receive', 'Send+Receive']
             Type of connection to analyse.
 
         Returns
         -------
-        weights : list
+        weights : numpy.ndarray
             weight of connection of node_a to its edges
         edge_coordinates : list of form [edge_x, edge_y]
             Coordinates for plotly Scatter routines
-            List 0 are the x coordinates, list 1 are the y coordinates
-        line_data : list of form [x0, y0, x1, y1, weight]
+            Array 0 are the x coordinates, array 1 are the y coordinates
+        line_data : numpy.ndarray with rows of form [x0, x1, y0, y1, weight]
             Data structure to allow plotly to easily plot each edge connection lines
                 separately based on the weight of connections between each node.
                 The weight is normalized to range from 0 to 1
 
         Notes
         -------
-        1) Plot data is extracted from self.composite_graph.
-        2) Node coordinates are determined by self.node_positions.
+        1) Edges are found with edge_segments.
+        2) Each segment in edge_coordinates is followed by a nan so that all the lines
+            don't connect end-to-end in plotly.
+        """
+        segments, weights, widths = self.edge_segments(node_a, edge_type)
+
+        # Segment start, end and a nan separator for each edge, flattened into one array per axis
+        edge_xy = np.full((len(segments), 3, 2), np.nan)
+        edge_xy[:, :2] = segments
+        edge_coordinates = [edge_xy[:, :, 0].ravel(), edge_xy[:, :, 1].ravel()]
+
+        line_data = np.column_stack([segments[:, 0, 0], segments[:, 1, 0], segments[:, 0, 1], segments[:, 1, 1],
+                                     widths])
+        return edge_coordinates, line_data, weights
+
+    def edge_segments(self, node_a, edge_type):
+        """Find the line segments and weights of the edges of the node of interest.
+
+        Parameters
+        ----------
+        node_a : int
+            The node id of interest (the one selected in the figure).
+        edge_type : ['Send', 'Receive', 'Send+Receive']
+            Type of connection to analyse.
+
+        Returns
+        -------
+        segments : numpy.ndarray of float
+            (k, 2, 2) array with the [[x0, y0], [x1, y1]] coordinates of the k edges of node_a,
+                e.g. for matplotlib.collections.LineCollection.
+        weights : numpy.ndarray
+            weight of connection of node_a to each edge.
+        widths : numpy.ndarray of float
+            weights normalized to range from 0 to 1.
+
+        Notes
+        -------
+        1) The neighbours of node_a are a row slice of the sparse graph (self.graph) and their coordinates
+            are fancy-indexed from the node coordinate array (self.node_table.xy), no per-edge python loop.
         """
         if node_a not in self.node_positions:
             raise Exception(f"Node: {node_a} Not Found in self.node_positions")
 
-        node_a_coordinates = self.node_positions[node_a]
-        x0, y0 = node_a_coordinates
-
-        weights = []
-        edge_x = []
-        edge_y = []
-        line_data = []
-
-        # Find the edges associated with specified edge_type
-        edge = self.composite_dict[node_a][edge_type + " Edges"]
-        # print(f"edge: {edge}")
-        # loop through each node in edge to extract weight and coordinate info
-        for node_b, weight in edge.items():
-            # print(f"node_b: {node_b}")
-            weights.append(weight)
-            node_b_coordinates = self.node_positions[node_b]
-            # Find start/end coordinates for the connecting line based on node location
-            x1, y1 = node_b_coordinates
-            edge_x.append(x0)
-            edge_x.append(x1)
-            edge_y.append(y0)
-            edge_y.append(y1)
-            # You have to end each segment with a None so that all the lines don't connect end-to-end in plotly
-            edge_x.append(None)
-            edge_y.append(None)
-            line_data.append([x0, x1, y0, y1, weight])
-
-        # Save edge_coordinates as a list of lists
-        edge_coordinates = [edge_x, edge_y]
-
-        # Save line_data as a numpy array with the weight normalize between 0 and 1
-        if line_data:
-            line_data = np.asarray(line_data)
-            max_weight = np.max(line_data[:, 4])
-            line_data[:, 4] = line_data[:, 4] / max_weight
-        return edge_coordinates, line_data, weights
+        edge_nodes, weights = self.graph.edges(node_a, edge_type)
+        xy = self.node_table.xy
+        segments = np.empty((len(edge_nodes), 2, 2))
+        segments[:, 0] = xy[node_a]
+        segments[:, 1] = xy[edge_nodes]
+
+        widths = weights / weights.max() if len(weights) else np.zeros(0)
+        return segments, weights, widths
 
     def lines_to_shapes(self, lines, min_weight=0.4, max_weight=3.0):
         """Convert line data to shapes that can be visualized in plotly.
@@ -643,3 +1741,46 @@ class NetworkLogReader:
             shapes.append(d)
         return shapes
         pass
+
+    def lines_to_traces(self, lines, min_weight=0.4, max_weight=3.0):
+        """Group line data into a few line widths that can be visualized as plotly line traces.
+
+        Parameters
+        ----------
+        lines : numpy.ndarray with rows of form [x0, x1, y0, y1, weight]
+                Weight varies from 0 to 1
+        min_weight : numeric
+            Minimum weight for a plot line, anything below 0.4 is really hard to see.
+        max_weight : numeric
+            Maximum weight added to min_weight, anything greater than 5 obscures nodes.
+
+        Returns
+        -------
+        traces : list of dict
+            One dict per width class with keys 'x', 'y' and 'width', thinnest first.
+                'x' and 'y' are lists with the line coordinates of the class separated by None,
+                so each class can be drawn as a single plotly Scatter trace.
+
+        Notes
+        -------
+        1) The weights are split into self.edge_width_classes equal ranges.  A line with weight w in
+            ((k-1)/classes, k/classes] is drawn with width min_weight + k/classes * max_weight,
+            so the heaviest line has the same width as in lines_to_shapes.
+        2) Every class is returned, even if it has no lines, so a figure always has the same
+            number of edge traces and changing the node of interest only restyles them.
+        """
+        lines = np.asarray(lines, dtype=float).reshape(-1, 5)
+        num_classes = self.edge_width_classes
+        classes = np.clip(np.ceil(lines[:, 4] * num_classes).astype(int) - 1, 0, num_classes - 1)
+
+        traces = []
+        for k in range(num_classes):
+            class_lines = lines[classes == k]
+            # x0, x1, None for each line (and the same for y)
+            x = np.full((len(class_lines), 3), None, dtype=object)
+            y = np.full((len(class_lines), 3), None, dtype=object)
+            x[:, :2] = class_lines[:, 0:2]
+            y[:, :2] = class_lines[:, 2:4]
+            traces.append({'x': x.ravel().tolist(), 'y': y.ravel().tolist(),
+                           'width': min_weight + (k + 1) / num_classes * max_weight})
+        return traces
@@ -0,0 +1,182 @@
+"""
+NetworkLogSketch keeps a fixed memory summary of the senders, receivers and
+sender/receiver pairs with the most fails over network failure logs of any length.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import pandas as pd
+import numpy as np
+
+from network_log_parsers_v01 import NetworkLogParser
+
+
+class NetworkLogSketch:
+    """Approximate top senders, receivers and edges of network failure logs in fixed memory.
+
+    Each kind of key keeps at most capacity counters (Misra-Gries heavy hitter summary).
+
+    Notes
+    -------
+    1. The counted fails of a key are a lower bound of its true fails, short by at most self.error[kind].
+        Every key with more than self.error[kind] fails is guaranteed to be counted.
+    2. self.error[kind] is at most total_fails / (capacity + 1), so the error shrinks as capacity grows.
+    3. Sketches of different logs can be merged (see merge) with the same guarantees,
+        so logs can be summarized in parallel.
+    """
+
+    # Kinds of keys counted by the sketch
+    kinds = ('sender', 'receiver', 'edge')
+
+    def __init__(self, capacity=1000):
+        """Initialize NetworkLogSketch.
+
+        Parameters
+        ----------
+        capacity : int
+            Maximum number of counters kept for each kind of key.
+        """
+        self.capacity = capacity
+        self.line_count = 0
+        self.total_fails = 0
+
+        # Counted keys (uint32 ip address, or sender << 32 | receiver for edges) and their fails
+        self.keys = {kind: np.zeros(0, dtype=np.uint64) for kind in self.kinds}
+        self.counts = {kind: np.zeros(0, dtype=np.int64) for kind in self.kinds}
+        # Largest amount by which a count can fall short of the true fails
+        self.error = {kind: 0 for kind in self.kinds}
+
+    def update(self, fails, sender, receiver):
+        """Add the lines of a parsed log chunk to the sketch.
+
+        Parameters
+        ----------
+        fails : numpy.ndarray
+            Number of fails of each line.
+        sender, receiver : numpy.ndarray of uint32
+            ip address of the sender/receiver of each line.
+        """
+        fails = np.asarray(fails, dtype=np.int64)
+        sender = np.asarray(sender, dtype=np.uint64)
+        receiver = np.asarray(receiver, dtype=np.uint64)
+        self.line_count += len(fails)
+        self.total_fails += int(fails.sum())
+
+        edge = (sender << np.uint64(32)) | receiver
+        for kind, keys in zip(self.kinds, (sender, receiver, edge)):
+            self.add_counts(kind, *self.sum_by_key(keys, fails))
+
+    def merge(self, other):
+        """Add the counts of another sketch, e.g. of another log file, to this sketch."""
+        self.line_count += other.line_count
+        self.total_fails += other.total_fails
+        for kind in self.kinds:
+            self.add_counts(kind, other.keys[kind], other.counts[kind], other.error[kind])
+
+    def add_counts(self, kind, keys, counts, error=0):
+        """Add summed fails of unique keys to the counters of kind.
+
+        Parameters
+        ----------
+        kind : str
+            One of self.kinds.
+        keys : numpy.ndarray of uint64
+            Unique keys.
+        counts : numpy.ndarray of int64
+            Fails of each key.
+        error : int
+            Error of counts (non zero when merging another sketch).
+
+        Notes
+        -------
+        1. If more than capacity keys remain, the (capacity+1)th largest count is subtracted from
+            every counter and counters that drop to zero are removed.  Each removed fail is matched
+            by the same removal from at least capacity other keys, which bounds the error.
+        """
+        keys, counts = self.sum_by_key(np.concatenate([self.keys[kind], keys]),
+                                       np.concatenate([self.counts[kind], counts]))
+        self.error[kind] += error
+
+        if len(keys) > self.capacity:
+            cut = np.partition(counts, len(keys) - self.capacity - 1)[len(keys) - self.capacity - 1]
+            counts = counts - cut
+            keep = counts > 0
+            keys, counts = keys[keep], counts[keep]
+            self.error[kind] += int(cut)
+
+        self.keys[kind] = keys
+        self.counts[kind] = counts
+
+    @staticmethod
+    def sum_by_key(keys, counts):
+        """Sum counts of equal keys.
+
+        Returns
+        -------
+        keys : numpy.ndarray of uint64
+            Sorted unique keys.
+        counts : numpy.ndarray of int64
+            Summed counts of each key.
+        """
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        if len(keys) == 0:
+            return keys, np.zeros(0, dtype=np.int64)
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        return keys[starts], np.add.reduceat(np.asarray(counts, dtype=np.int64)[order], starts)
+
+    def top(self, kind, num_of_top=25):
+        """Find the keys of kind with the most fails.
+
+        Parameters
+        ----------
+        kind : str
+            'sender', 'receiver' or 'edge'.
+        num_of_top : int
+            Number of keys returned.
+
+        Returns
+        -------
+        top_df : pandas.DataFrame
+            Indexed by ip address (or 'sender -> receiver' for edges), sorted descending by fails.
+            fails is the counted (lower bound) fails and max_fails the upper bound of the true fails.
+        """
+        keys, counts = self.keys[kind], self.counts[kind]
+        if len(keys) > num_of_top:
+            top = np.argpartition(counts, len(keys) - num_of_top)[len(keys) - num_of_top:]
+            keys, counts = keys[top], counts[top]
+        order = np.lexsort((keys, -counts))
+        keys, counts = keys[order], counts[order]
+
+        if kind == 'edge':
+            names = np.char.add(np.char.add(NetworkLogParser.int_to_ip(keys >> np.uint64(32)), ' -> '),
+                                NetworkLogParser.int_to_ip(keys & np.uint64(0xFFFFFFFF)))
+        else:
+            names = NetworkLogParser.int_to_ip(keys)
+        return pd.DataFrame({'fails': counts, 'max_fails': counts + self.error[kind]},
+                            index=pd.Index(names, name=kind))
+
+    def print_top_fails(self, num_of_top=25):
+        """Print the top servers and connections with sender & receiver errors.
+
+         Parameters
+         ----------
+         num_of_top : int
+             Number of servers to output.
+             For example, num_of_top=15 to show the worst 15 servers
+        """
+        max_rows = pd.get_option('display.max_rows')
+        pd.set_option('display.max_rows', None)
+
+        print('*'*100)
+        print(f'Approximate top servers of {self.line_count} lines with {self.total_fails} total errors '
+              f'({self.capacity} counters per table)')
+        for kind, label in zip(self.kinds, ('servers with sending fails', 'servers with receiving fails',
+                                            'connections with fails')):
+            print(f'\nThe top {num_of_top} {label}, counts may be up to {self.error[kind]} fails low')
+            print(self.top(kind, num_of_top))
+        print('*'*100)
+
+        pd.set_option('display.max_rows', max_rows)
@@ -0,0 +1,213 @@
+"""
+NodeTable and EdgeTable hold the parsed network failure log as compact numpy columns,
+with read-only dictionary views for node id lookups.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class ColumnTable:
+    """Base class of tables stored as equal length numpy columns named by column_names."""
+
+    __slots__ = ()
+
+    # Attributes holding the columns, subclasses list them first in __slots__
+    column_names = ()
+
+    # Counts are stored as int32 unless they could overflow it
+    count_dtype = np.int32
+
+    def __len__(self):
+        return len(getattr(self, self.column_names[0]))
+
+    def columns(self):
+        """Dictionary of the column arrays of the table keyed by name."""
+        return {name: getattr(self, name) for name in self.column_names}
+
+    def nbytes(self):
+        """Number of bytes used by the columns of the table."""
+        return sum(column.nbytes for column in self.columns().values())
+
+    @staticmethod
+    def compact_counts(values, headroom=0):
+        """Convert non negative integer counts to int32 if they (plus headroom) fit, else int64.
+
+        The values are not copied if they already have the selected dtype, so memory mapped
+        columns stay memory mapped.
+        """
+        values = np.asarray(values)
+        limit = np.iinfo(ColumnTable.count_dtype).max
+        largest = int(values.max()) if len(values) else 0
+        dtype = ColumnTable.count_dtype if largest + headroom <= limit else np.int64
+        return values.astype(dtype, copy=False)
+
+    def add_counts(self, name, ids, values):
+        """Add values to column name at positions ids (repeated ids are summed).
+
+        The column is widened to int64 first if the sums could overflow int32.
+        """
+        column = getattr(self, name)
+        values = np.asarray(values)
+        if column.dtype != np.int64 and len(values) and int(column.max(initial=0)) + int(values.sum()) > \
+                np.iinfo(column.dtype).max:
+            column = column.astype(np.int64)
+        elif not column.flags.writeable:
+            column = column.copy()
+        np.add.at(column, ids, values)
+        setattr(self, name, column)
+
+
+class NodeTable(ColumnTable):
+    """Per-node columns indexed by node id.
+
+    Attributes
+    ----------
+    addresses : numpy.ndarray of uint32
+        Sorted ip address of each node (see NetworkLogParser.ip_to_int).
+    send_fails, receive_fails : numpy.ndarray of int32|int64
+        Summed fails of the lines each node sent/received.
+    send_lines, receive_lines : numpy.ndarray of int32|int64
+        Number of lines each node sent/received.
+    xy : numpy.ndarray of float32
+        Contiguous (N, 2) array with the x, y layout coordinates of each node, nan until set_positions is called.
+    """
+
+    column_names = ('addresses', 'send_fails', 'receive_fails', 'send_lines', 'receive_lines', 'xy')
+    __slots__ = column_names
+
+    def __init__(self, addresses, send_fails, receive_fails, send_lines, receive_lines):
+        """Initialize NodeTable, see the class docstring for the columns."""
+        self.addresses = np.asarray(addresses, dtype=np.uint32)
+        self.send_fails = self.compact_counts(send_fails)
+        self.receive_fails = self.compact_counts(receive_fails)
+        self.send_lines = self.compact_counts(send_lines)
+        self.receive_lines = self.compact_counts(receive_lines)
+        self.xy = np.full((len(self.addresses), 2), np.nan, dtype=np.float32)
+
+    def set_positions(self, positions):
+        """Store layout coordinates given as a dictionary of [x, y] keyed by node id,
+        or as an (N, 2) array with the coordinates of every node id."""
+        if isinstance(positions, np.ndarray):
+            self.xy[:] = positions
+            return
+        ids = np.fromiter(positions.keys(), dtype=np.intp, count=len(positions))
+        self.xy[ids] = np.asarray(list(positions.values()), dtype=np.float32).reshape(-1, 2)
+
+
+class EdgeTable(ColumnTable):
+    """Per-line (or per-edge) columns in log file order.
+
+    Attributes
+    ----------
+    sender_id, receiver_id : numpy.ndarray of uint32
+        Node id of the sender/receiver of each line.
+    fails : numpy.ndarray of int32|int64
+        Number of fails of each line.
+    buffers : None|dict
+        Buffers with spare capacity that the columns are views of once lines were appended, see append.
+    """
+
+    column_names = ('sender_id', 'receiver_id', 'fails')
+    __slots__ = column_names + ('buffers',)
+
+    def __init__(self, sender_id, receiver_id, fails):
+        """Initialize EdgeTable, see the class docstring for the columns."""
+        self.sender_id = np.asarray(sender_id).astype(np.uint32, copy=False)
+        self.receiver_id = np.asarray(receiver_id).astype(np.uint32, copy=False)
+        self.fails = self.compact_counts(fails)
+        self.buffers = None
+
+    def append(self, sender_id, receiver_id, fails):
+        """Append new lines to the end of the table.
+
+        The columns are views of buffers whose capacity doubles when they are full, so appending
+        a few lines at a time (e.g. following a log) copies each line an amortized constant number of times.
+        """
+        new_columns = {'sender_id': np.asarray(sender_id, dtype=np.uint32),
+                       'receiver_id': np.asarray(receiver_id, dtype=np.uint32),
+                       'fails': self.compact_counts(fails)}
+        new_columns['fails'] = new_columns['fails'].astype(np.promote_types(self.fails.dtype,
+                                                                            new_columns['fails'].dtype))
+        size = len(self)
+        new_size = size + len(new_columns['fails'])
+
+        buffers = self.buffers
+        if buffers is None or len(buffers['fails']) < new_size or buffers['fails'].dtype != new_columns['fails'].dtype:
+            capacity = max(new_size, 2 * size, 1024)
+            buffers = {name: np.empty(capacity, dtype=column.dtype) for name, column in new_columns.items()}
+            for name in self.column_names:
+                buffers[name][:size] = getattr(self, name)
+            self.buffers = buffers
+
+        for name, column in new_columns.items():
+            buffers[name][size:new_size] = column
+            setattr(self, name, buffers[name][:new_size])
+
+
+class NodeValueView(Mapping):
+    """Read-only dictionary view of node columns, keyed by node id.
+
+    Only ids are keys, in the order given.  The value of a key is the sum of the columns
+    at that node id, so the view always reflects the current column values.
+    """
+
+    __slots__ = ('ids', 'columns', 'present')
+
+    def __init__(self, ids, *columns):
+        """Initialize NodeValueView.
+
+        Parameters
+        ----------
+        ids : numpy.ndarray of int
+            Node ids that are keys of the view.
+        columns : numpy.ndarray
+            Node columns whose sum is the value of each key.
+        """
+        self.ids = ids
+        self.columns = columns
+        self.present = np.zeros(len(columns[0]), dtype=bool)
+        self.present[ids] = True
+
+    def __getitem__(self, node):
+        if not (isinstance(node, (int, np.integer)) and 0 <= node < len(self.present) and self.present[node]):
+            raise KeyError(node)
+        return sum(int(column[node]) for column in self.columns)
+
+    def __contains__(self, node):
+        return isinstance(node, (int, np.integer)) and 0 <= node < len(self.present) and bool(self.present[node])
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class NodePositionView(Mapping):
+    """Read-only dictionary view of the NodeTable coordinates, node id -> (x, y)."""
+
+    __slots__ = ('node_table',)
+
+    def __init__(self, node_table):
+        self.node_table = node_table
+
+    def __getitem__(self, node):
+        if node not in self:
+            raise KeyError(node)
+        return float(self.node_table.xy[node, 0]), float(self.node_table.xy[node, 1])
+
+    def __contains__(self, node):
+        return isinstance(node, (int, np.integer)) and 0 <= node < len(self.node_table) and \
+            not np.isnan(self.node_table.xy[node, 0])
+
+    def __iter__(self):
+        return iter(np.flatnonzero(~np.isnan(self.node_table.xy[:, 0])).tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self.node_table.xy[:, 0])))
@@ -0,0 +1,119 @@
+"""
+Tests of the decompression of gzip and zstd logs by NetworkLogParser.
+
+Created by: Tony Held tony.held@gmail.com
+Created on: 2020/09/10
+Copyright © 2020 Tony Held.  All rights reserved.
+"""
+
+import gzip
+import mmap
+
+import pytest
+
+from network_log_parsers_v01 import NetworkLogParser
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def read_log(file_name, workers):
+    with NetworkLogParser.open_log(file_name, workers=workers) as f:
+        return f.read()
+
+
+def test_gzip_false_candidate(tmp_path, monkeypatch):
+    """A member header pattern inside the compressed data must not split a single member log."""
+    data = NetworkLogParser.example_log_bytes(5000)
+    data = data[:len(data) // 2] + b'\x1f\x8b\x08\x00' + data[len(data) // 2:]
+    # Stored (level 0) deflate blocks keep the header pattern in the compressed bytes
+    file_name = tmp_path / 'log.txt.gz'
+    file_name.write_bytes(gzip.compress(data, compresslevel=0))
+
+    with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        assert len(NetworkLogParser.gzip_member_candidates(buf)) == 2
+
+    monkeypatch.setattr(NetworkLogParser, 'gzip_piece_bytes', 1 << 12)
+    chunks = list(NetworkLogParser.iter_decompressed(file_name, 'gzip', workers=2))
+    assert b''.join(chunks) == data
+    # The member is streamed in bounded pieces rather than returned as a whole
+    assert max(len(chunk) for chunk in chunks) <= 1 << 12
+    assert read_log(file_name, workers=2) == data
+
+
+@pytest.mark.parametrize('piece_bytes', [1 << 10, 1 << 24])
+def test_gzip_members(tmp_path, monkeypatch, piece_bytes):
+    monkeypatch.setattr(NetworkLogParser, 'gzip_piece_bytes', piece_bytes)
+    data = NetworkLogParser.example_log_bytes(3000)
+    pieces = [data[i:i + 10000] for i in range(0, len(data), 10000)]
+    file_name = tmp_path / 'log.txt.gz'
+    # gzip allows zero padding after the last member
+    file_name.write_bytes(b''.join(gzip.compress(piece) for piece in pieces) + bytes(16))
+
+    assert read_log(file_name, workers=3) == data
+    assert read_log(file_name, workers=1) == data
+
+
+def test_gzip_truncated(tmp_path):
+    compressed = gzip.compress(NetworkLogParser.example_log_bytes(1000))
+    file_name = tmp_path / 'log.txt.gz'
+    file_name.write_bytes(compressed + compressed[:len(compressed) // 2])
+    with pytest.raises(Exception, match='gzip'):
+        read_log(file_name, workers=2)
+
+
+@pytest.mark.skipif(zstandard is None, reason='zstandard is not installed')
+def test_zstd_frame_spans(tmp_path):
+    data = NetworkLogParser.example_log_bytes(3000)
+    stream = zstandard.ZstdCompressor().compressobj()
+    frames = [
+        # Content size and checksum in the frame header
+        zstandard.ZstdCompressor(write_checksum=True).compress(data[:20000]),
+        # Skippable frame between data frames
+        (0x184D2A5A).to_bytes(4, 'little') + (5).to_bytes(4, 'little') + b'extra',
+        # Long runs are stored as RLE blocks
+        zstandard.ZstdCompressor(level=1).compress(b'\n' * 300000),
+        # No content size in the header of a streamed frame
+        stream.compress(data[20000:]) + stream.flush(),
+    ]
+    compressed = b''.join(frames)
+
+    offsets = [0]
+    for frame in frames:
+        offsets.append(offsets[-1] + len(frame))
+    expected = [(offsets[i], offsets[i + 1]) for i in (0, 2, 3)]
+    assert NetworkLogParser.zstd_frame_spans(compressed) == expected
+
+    file_name = tmp_path / 'log.txt.zst'
+    file_name.write_bytes(compressed)
+    expected_data = data[:20000] + b'\n' * 300000 + data[20000:]
+    assert read_log(file_name, workers=2) == expected_data
+    assert read_log(file_name, workers=1) == expected_data
+
+
+@pytest.mark.skipif(zstandard is None, reason='zstandard is not installed')
+def test_zstd_corrupt(tmp_path):
+    compressed = zstandard.ZstdCompressor().compress(NetworkLogParser.example_log_bytes(1000))
+    with pytest.raises(Exception, match='Truncated zstd frame'):
+        NetworkLogParser.zstd_frame_spans(compressed + compressed[:len(compressed) // 2])
+    with pytest.raises(Exception, match='Corrupt zstd frame'):
+        NetworkLogParser.zstd_frame_spans(compressed + b'garbage!')
+
+
+@pytest.mark.parametrize('blank', [b'   \n', b'\t \r\n', b'\n'])
+def test_engines_skip_blank_lines(tmp_path, blank):
+    """Every engine skips whitespace-only lines, including a trailing one, and parses the same columns."""
+    lines = NetworkLogParser.example_log_bytes(200).splitlines(keepends=True)
+    data = b''.join(lines[:100]) + blank + b''.join(lines[100:]) + blank
+    file_name = tmp_path / 'log.txt'
+    file_name.write_bytes(data)
+
+    expected = NetworkLogParser.parse_bytes(b''.join(lines), 'numpy')
+    for engine in NetworkLogParser.available_engines():
+        parsed = [NetworkLogParser.parse_bytes(data, engine), NetworkLogParser.parse_file(str(file_name), engine)]
+        for columns in parsed:
+            assert len(columns) == 3
+            for column, expected_column in zip(columns, expected):
+                assert column.tolist() == expected_column.tolist(), engine